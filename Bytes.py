@@ -1,15 +1,29 @@
-from .id_class import Id
-from .config import getbot, getbot_id, Bot
+from .id_class import Id, PendingId, POINTER_RESERVE
+from .config import getbot, getbot_id, upload_window, Bot, dump_links, load_links
 from .bytes_string import *
+from .executor import submit_read, submit_write, result_of, Ready
 import threading
+import shutil
+import os
+import bisect
+import io
+from itertools import accumulate
 from queue import Queue
+from collections import deque
 from .chain import Chain
-from .bytes_string import *
+from .stream import ChunkReader, mapped, READ_AHEAD, MEMORY_BUDGET, COPY_BUFFER
+from .manifest import chunk_info, check_chunk, chunk_table, totals, split_table, read_table, split_chunks
 
 FILE_SIZE = 19500000
 MANIFEST_PAGE_LIMIT = 3950  # approx character limit per manifest page
 THRESHOLD = MANIFEST_PAGE_LIMIT * 3
 
+def _chunk_source(value):
+    """`value` cut into chunks without copies: immutable data is sliced through a memoryview."""
+    if(isinstance(value, bytes) or (isinstance(value, memoryview) and value.readonly)):
+        return memoryview(value).cast("B")
+    return value
+
 class Bytes:
     """
     Универсальный класс для хранения данных.
@@ -17,7 +31,7 @@ class Bytes:
     Авто-конвертация при добавлении/установке.
     """
 
-    def __init__(self, value=None, id=None, init_symbol="b", cache_limit=-1):
+    def __init__(self, value=None, id=None, init_symbol="b", cache_limit=-1, path=None):
         self._obj = None
         self._init_symbol = init_symbol
         self._cache_limit = cache_limit
@@ -27,6 +41,8 @@ class Bytes:
                 self._obj = LinkedBytes(id=id, init_symbol=init_symbol, cache_limit=cache_limit)
             else:
                 self._obj = SimpleBytes(id=id, init_symbol=init_symbol)
+        elif path is not None:
+            self._obj = self._from_path(path)
         else:
             if value is not None and len(value) > THRESHOLD:
                 self._obj = LinkedBytes(value=value, init_symbol=init_symbol, cache_limit=cache_limit)
@@ -53,6 +69,22 @@ class Bytes:
     def __bytes__(self):
         return bytes(self._obj)
 
+    def __len__(self):
+        return len(self._obj)
+
+    def open(self, mode="rb", read_ahead=READ_AHEAD, memory=MEMORY_BUDGET, inflight=None):
+        if mode != "rb" and isinstance(self._obj, SimpleBytes):
+            # a stream of unknown size is written as LinkedBytes
+            value = bytes(self._obj) if mode == "ab" else bytes()
+            self._obj = LinkedBytes(value=value, init_symbol=self._init_symbol, cache_limit=self._cache_limit)
+        return self._obj.open(mode, read_ahead, memory, inflight)
+
+    def read(self, offset=0, length=None):
+        return self._obj.read(offset, length)
+
+    def readinto(self, buffer, offset=0):
+        return self._obj.readinto(buffer, offset)
+
     def save(self, file):
         if hasattr(self._obj, "save"):
             return self._obj.save(file)
@@ -63,11 +95,23 @@ class Bytes:
     def from_file(self, file, change_last=True):
         if isinstance(self._obj, LinkedBytes):
             return self._obj.from_file(file, change_last=change_last)
+        if os.stat(file).st_size > THRESHOLD:
+            self._obj = self._from_path(file)
+            return self
         with open(file, "rb") as f:
             data = f.read()
         self.set(data)
         return self
 
+    def _from_path(self, path):
+        """SimpleBytes or LinkedBytes holding the file at `path`, chosen by its size on disk.
+
+        Large files are never read whole: LinkedBytes maps them and uploads views of the map."""
+        if os.stat(path).st_size > THRESHOLD:
+            return LinkedBytes(init_symbol=self._init_symbol, cache_limit=self._cache_limit).from_file(path, change_last=False)
+        with open(path, "rb") as f:
+            return SimpleBytes(value=f.read(), init_symbol=self._init_symbol)
+
     def add(self, value=None, urls=None, *, change_last=True):
         if isinstance(value, Bytes):
             value = bytes(value)
@@ -84,7 +128,7 @@ class Bytes:
         else:
             def async_add():
                 self._obj.add(value=value, urls=urls, change_last=change_last)
-            threading.Thread(target=async_add, daemon=True).start()
+            submit_write(async_add)
 
         return self
 
@@ -115,22 +159,59 @@ class Chunk:
     def __init__(self):
         self.lock = threading.RLock()
         self.event = threading.Event()
-        self.id:Id = Id().lock()
+        self.id:Id|PendingId = PendingId()
+        self.info = None  # size and crc32 of the document, from the manifest or the upload
+        self.known_size = None  # size asked from Telegram when the manifest has no chunk table
     
-    def set(self, value=None, func=None, id=None, *, save=True):
+    def set(self, value=None, func=None, id=None, *, save=True, info=None, copy=False):
+        """Uploads `value` (or what `func` returns), or points at the document `id`.
+
+        Views are sent without copying. `save` keeps the data cached: with `copy`
+        a view is copied after the upload so the buffer it was cut from can be
+        freed; otherwise a view of bytes is kept as it is and a view of any other
+        buffer is dropped after the upload, to be downloaded when read."""
         with self.lock:
+            self.known_size = None
             if(id == None):
-                self.id = Id().lock()
-                threading.Thread(target=self.upload, args=(value, func, save)).start()
+                self.id = PendingId()
+                self.info = None
+                submit_write(self.upload, value, func, save, copy)
             else:
-                self.id = id
+                self.id = Id(id)
+                self.info = info
                 if(save):
                     self.cache()
             return self
 
     def clear(self):
-        self.value = None
+        with self.lock:
+            self.value = None
+            self.event.clear()
         return self
+
+    def fetch(self):
+        """Bytes of the chunk, downloaded without keeping them if they are not cached."""
+        with self.lock:
+            if(self.event.is_set()):
+                return self.value
+            id, info = self.id, self.info
+        return check_chunk(getbot_id(id).get_document(id), info, id)
+
+    def size(self):
+        """Length in bytes; asked from Telegram, without downloading the chunk, when the manifest did not record it."""
+        if(self.info is not None):
+            return self.info.size
+        with self.lock:
+            if(self.event.is_set()):
+                return len(self.value)
+            if(self.known_size is not None):
+                return self.known_size
+            id = Id(self.id)
+        size = getbot_id(id).get_document_size(id)
+        with self.lock:
+            if(self.id == id):
+                self.known_size = size
+        return size
     
     def get(self):
         with self.lock:
@@ -139,30 +220,40 @@ class Chunk:
             return self.value
 
     def cache(self):
-        threading.Thread(target=self.download).start()
+        submit_read(self.download)
 
     def download(self):
         with self.lock:
-            self.id.unlock()
             self.event.clear()
 
-            file_id = getbot_id(self.id).forward(self.id).document.file_id
-            file_info = getbot_id(self.id).bot.get_file(file_id)
-            self.value = getbot_id(self.id).bot.download_file(file_info.file_path)
+            self.value = check_chunk(getbot_id(self.id).get_document(self.id), self.info, self.id)
 
             self.event.set()
         return self
 
-    def upload(self, value, func, save):
+    def upload(self, value, func, save, copy=False):
         with self.lock:
-            self.id.lock()
-            if(func != None):
-                value = func()
-            if(save):
-                self.value = value
-
-            self.id.set(Id(getbot().send_document_id(value)))
-            self.id.unlock()
+            try:
+                if(func != None):
+                    value = func()
+                # a url is fetched by Telegram, its size is not known here
+                if(isinstance(value, (bytes, bytearray, memoryview))):
+                    self.info = chunk_info(value)
+
+                self.id.set(getbot().send_document_id(value))
+                if(save and isinstance(value, memoryview)):
+                    if(copy):
+                        # a cached view would keep the whole buffer it was cut from alive
+                        value = bytes(value)
+                    elif(not isinstance(value.obj, bytes)):
+                        # a buffer the caller owns (an mmap, say) may change or close after the upload
+                        save = False
+                if(save):
+                    self.value = value
+                    self.event.set()
+            except BaseException as e:
+                self.id.fail(e)
+                raise
     
     def wait_for_unlock(self):
         self.event.wait()
@@ -172,11 +263,14 @@ class Chunk:
 
 class LinkedBytes:
     def __init__(self, value=None, url=None, id=None, *, init_symbol="b", cache_limit=-1):
-        self.headers_lock = threading.Event() 
+        self.headers_lock = Ready()  # chunk list known (uploaded or downloaded)
+        self.appended = Ready(True)  # no add()/from_file() append pending
+        self._appending = 0
+        self._appending_lock = threading.Lock()
         self.lock = threading.RLock()
         self.init_symbol = init_symbol
         self.cache_limit = cache_limit
-        self._id:Id = Id().lock()
+        self._id:Id|PendingId = PendingId()
         self.chuncs:list[Chunk] = []
         self.manipages = []
         if(cache_limit != -1):
@@ -187,8 +281,7 @@ class LinkedBytes:
                 value = bytes()
             self.set(value, url)
         else:
-            self._id.set(id)
-            self._id.unlock()
+            self._id = Id(id)
             def f(self:LinkedBytes, value, url):
                 with self.lock:
                     self.header_download()
@@ -196,12 +289,11 @@ class LinkedBytes:
                         self.set(value, url)
                     elif(self.cache_limit > 0):
                         self.chuncs[-1].get()
-            threading.Thread(target=f, args=(self, value, url)).start()
+            submit_read(f, self, value, url)
 
     def set(self, value=None, urls=None):
         def th(self=self, value=value, urls=urls):
             with self.lock:
-                self._id.lock()
                 try:
                     if urls is not None:
                         self.chuncs = []
@@ -212,27 +304,32 @@ class LinkedBytes:
                                 self.gc()
                     else:
                         self.chuncs = []
+                        value = _chunk_source(value)
+                        # with every chunk cached the views hold nothing beyond the value itself
+                        copy = self.cache_limit != -1
                         cn = ci = 0
                         for i in range(0, len(value), FILE_SIZE):
                             if cn != self.cache_limit:
                                 val = value[i:i + FILE_SIZE]
-                                self.chuncs.append(Chunk().set(val))
+                                self.chuncs.append(Chunk().set(val, copy=copy))
                                 cn += 1
                             else:
                                 def fun(chunc: Chunk = self.chuncs[ci], data=value[i:i + FILE_SIZE]):
-                                    chunc.id.wait_for_unlock()
+                                    chunc.id.resolve()
                                     chunc.clear()
                                     return data
-                                self.chuncs.append(Chunk().set(func=fun))
+                                self.chuncs.append(Chunk().set(func=fun, copy=copy))
                                 ci += 1
                                 if self.cache_limit != -1:
                                     self.cache_queue.put(self.chuncs[-1])
                                     self.gc()
                     self.header_upload()
-                finally:
-                    self._id.unlock()
-        t = threading.Thread(target=th)
-        t.start()
+                except BaseException as e:
+                    if(not self._id.done()):
+                        self._id.fail(e)
+                    self.headers_lock.fail(e)
+                    raise
+        submit_write(th)
         return self
 
     
@@ -244,7 +341,8 @@ class LinkedBytes:
                         self.chuncs.extend(value.chuncs)
                         self.header_upload()
                     else:
-                        self.add(bytes(value))
+                        # reading self here would wait for this very append
+                        self.add(b"".join(bytes(c.get()) for c in self.chuncs) if value is self else bytes(value))
                     return
 
                 if urls is not None:
@@ -253,23 +351,25 @@ class LinkedBytes:
                     self.header_upload()
                     return
 
+                source = _chunk_source(value)
+                copy = self.cache_limit != -1
                 change_last_flag = change_last and len(self.chuncs) > 0
                 start_index = 0
                 if change_last_flag:
                     last = self.chuncs[-1]
                     last_data = last.get()
-                    last.set(func=lambda last_data=last_data, data=value[:len(last_data)]: last_data + data)
-                    start_index = len(last_data)
+                    start_index = max(0, FILE_SIZE - len(last_data))
+                    last.set(func=lambda last_data=last_data, data=source[:start_index]: bytes(last_data) + data)
 
                 cn = ci = 0
-                for i in range(start_index, len(value), FILE_SIZE):
-                    val = value[i:i + FILE_SIZE]
+                for i in range(start_index, len(source), FILE_SIZE):
+                    val = source[i:i + FILE_SIZE]
                     if cn != self.cache_limit:
-                        self.chuncs.append(Chunk().set(val))
+                        self.chuncs.append(Chunk().set(val, copy=copy))
                         cn += 1
                     else:
                         ch = Chunk()
-                        ch.set(func=lambda data=val: data)
+                        ch.set(func=lambda data=val: data, copy=copy)
                         self.chuncs.append(ch)
                         ci += 1
                     if self.cache_limit != -1:
@@ -277,8 +377,8 @@ class LinkedBytes:
                         self.gc()
                 self.header_upload()
 
-        t = threading.Thread(target=f)
-        t.start()
+        # readers and wait() see the appended data, or the error that lost it
+        self._append(f)
         return self
 
     def __iadd__(self, other):
@@ -299,42 +399,44 @@ class LinkedBytes:
                 return self.manipages[header - 1]
             else:
                 header += 1
-                self.manipages.append(Id(func=lambda self:self.set(getbot().send_message_id("tmp"))))
+                self.manipages.append(PendingId(func=lambda self:self.set(getbot().send_message_id("tmp"))))
                 return self.manipages[-1]
 
         with self.lock:
-            self._id.lock()
-
             if(self.manipages == []):
-                main_id = Id(func=lambda self:self.set(getbot().send_message_id("tmp")))
+                main_id = PendingId(func=lambda self:self.set(getbot().send_message_id("tmp")))
                 self.manipages.append(main_id)
             else:
                 main_id = self.manipages[0]
 
             init = self.init_symbol
-            text = ""
+            # chunk infos are set before the chunk ids resolve
+            ids = [Id(c.id) for c in self.chuncs]
+            infos = [c.info for c in self.chuncs]
+            # every page but the first written one starts with a pointer to the previous page
+            runs = split_chunks(ids, infos, MANIFEST_PAGE_LIMIT - POINTER_RESERVE)
             last = None
-            e = True
-            for c in self.chuncs:
-                lenlast = (len(last) if last != None else 0)
-                if(lenlast + len(text) + len(str(c.id)) < MANIFEST_PAGE_LIMIT):
-                    text += " " + str(c.id)
-                else:
-                    text = str(last if last != None else "") + text
-                    last = get_header()
-                    getbot_id(last).edit_message(last, "c" + (("e") if e else "") + text)
-                    e = False
-                    last = str(last)
-                    text = " " + str(c.id)
-
-            last = (last if last != None else "")
-            self._id.set(main_id)
-            getbot_id(main_id).edit_message(main_id, init + "l" + ("e" if e else "") + str(last) + text)
-            self._id.unlock()
+            for links, page_infos in runs[:-1]:
+                page = get_header()
+                getbot_id(page).edit_message(page, "c" + ("e" if last is None else "") + dump_links(([last] if last is not None else []) + links) + chunk_table(page_infos))
+                last = page
+
+            e = last is None
+            links, page_infos = runs[-1]
+            getbot_id(main_id).edit_message(main_id, init + "l" + ("e" if e else "") + dump_links(([last] if last is not None else []) + links) + chunk_table(page_infos, totals(infos)))
+            if(not self._id.done()):
+                self._id.set(main_id)
             self.headers_lock.set()
         return self
 
     def header_download(self):
+        try:
+            return self._header_download()
+        except BaseException as e:
+            self.headers_lock.fail(e)
+            raise
+
+    def _header_download(self):
         with self.lock:
             self.headers_lock.clear()
             self.manipages = [self._id]
@@ -343,22 +445,44 @@ class LinkedBytes:
                 
                 raise Exception(f"Message {self.id} is not a LinkedBytes!")
             text = text[2:]
-            total = []
-            while text[0] != "e":
-                ids = list(map(Id, text.split()))
+            # pages are read newest first: each one holds the links in front of the previous one
+            links, infos = [], []
+            total = None
+            first = True
+            while True:
+                end = text.startswith("e")
+                body, table = split_table(text[1:] if end else text)
+                ids = load_links(body)
+                page_links = ids if end else ids[1:]
+                page_total, page_infos = read_table(table, len(page_links), first)
+                if(first):
+                    total, first = page_total, False
+                links, infos = page_links + links, page_infos + infos
+                if(end):
+                    break
                 next = ids[0]
                 self.manipages.append(next)
                 text = getbot_id(next).get_text(next)[1:]
-                total = ids[1:] + total
 
-            total = ids = list(map(Id, text[1:].split())) + total
-            self.chuncs = [Chunk().set(id=id, save=(self.cache_limit == -1)) for id in ids]
+            if(total is not None and totals(infos) != total):
+                raise ValueError(f"Manifest of {self._id} is corrupted: chunk table does not match its totals")
+            # chunks download when they are read; cache() fetches all of them ahead
+            self.chuncs = [Chunk().set(id=id, save=False, info=info) for id, info in zip(links, infos)]
             self.headers_lock.set()
         return self
 
+    def cache(self):
+        """Starts downloading every chunk that is not cached yet into the cache."""
+        self.wait()
+        with self.lock:
+            for chunc in self.chuncs:
+                if(not chunc.event.is_set()):
+                    chunc.cache()
+        return self
+
     def get_chunk(self, chunk):
         with self.lock:
-            return self.chuncs[chunk].get()
+            return bytes(self.chuncs[chunk].get())
 
     @property
     def id(self):
@@ -368,15 +492,64 @@ class LinkedBytes:
     def id(self, value):
         with self.lock:
             self._id = Id(value)
-            threading.Thread(target=self.header_download).start()
+            self.headers_lock.clear()
+            submit_read(self.header_download)
 
-    def __bytes__(self):
+    def wait(self, timeout=None):
+        """Waits until the chunk list is known; re-raises the load/upload error."""
+        self.appended.wait(timeout)
+        self.headers_lock.wait(timeout)
+        return self
+
+    def _offsets(self):
+        """Chunk list and the start offset of every chunk, plus the total size as the last entry."""
+        self.appended.wait()
+        self.headers_lock.wait()
         with self.lock:
-            self.headers_lock.wait()
-            out = bytes()
-            for c in self.chuncs:
-                out += c.get()
-            return out
+            chuncs = list(self.chuncs)
+        # chunks missing from the chunk table are sized in parallel, without downloading them
+        unknown = {i: submit_read(c.size) for i, c in enumerate(chuncs) if c.info is None}
+        sizes = [result_of(unknown[i]) if i in unknown else c.info.size for i, c in enumerate(chuncs)]
+        return chuncs, [0, *accumulate(sizes)]
+
+    def readinto(self, buffer, offset=0):
+        """Fills `buffer` with the bytes starting at `offset` and returns how many were read.
+
+        Only the chunks overlapping the range are fetched, READ_AHEAD at a time,
+        and each is copied once, straight into `buffer`."""
+        return self._readinto(memoryview(buffer).cast("B"), offset, *self._offsets())
+
+    def _readinto(self, out, offset, chuncs, starts):
+        end = min(offset + len(out), starts[-1])
+        if(offset >= end):
+            return 0
+        first = bisect.bisect_right(starts, offset) - 1
+        last = bisect.bisect_left(starts, end)
+        pending = {}
+        for i in range(first, last):
+            for k in range(i, min(i + READ_AHEAD + 1, last)):
+                if(k not in pending):
+                    pending[k] = submit_read(chuncs[k].fetch)
+            data = memoryview(result_of(pending.pop(i)))
+            lo, hi = max(offset, starts[i]), min(end, starts[i + 1])
+            out[lo - offset:hi - offset] = data[lo - starts[i]:hi - starts[i]]
+        return end - offset
+
+    def read(self, offset=0, length=None):
+        """`length` bytes (all of them by default) from `offset`, as a bytearray."""
+        chuncs, starts = self._offsets()
+        offset = min(offset, starts[-1])
+        length = starts[-1] - offset if length is None else min(length, starts[-1] - offset)
+        buffer = bytearray(length)
+        self._readinto(memoryview(buffer), offset, chuncs, starts)
+        return buffer
+
+    def __bytes__(self):
+        return bytes(self.read())
+
+    def __len__(self):
+        """Size in bytes, from the chunk table when the manifest has one."""
+        return self._offsets()[1][-1]
 
     def __str__(self):
         return str(bytes(self))
@@ -395,69 +568,205 @@ class LinkedBytes:
         if(type(file) == str):
             file = open(file, "wb")
             cl = True
-        for c in self.chuncs:
-            file.write(c.get())
-            if(self.cache_limit != -1):
-                self.cache_queue.put(c)
-                self.gc()
-        if(cl):
-            file.close()
+        try:
+            with self.open() as reader:
+                shutil.copyfileobj(reader, file, COPY_BUFFER)
+        finally:
+            if(cl):
+                file.close()
         return self
+
+    def open(self, mode="rb", read_ahead=READ_AHEAD, memory=MEMORY_BUDGET, inflight=None):
+        """Raw stream over the data.
+
+        "rb": seekable reader streaming the chunks, `read_ahead` of them downloading
+        in parallel within `memory` bytes; chunks it fetches are not cached.
+        "wb"/"ab": LinkedBytesWriter replacing/extending the data, `inflight` chunks
+        (by default config.upload_window()) uploading at once; the manifest is
+        written on close."""
+        if(mode in ("wb", "ab")):
+            return LinkedBytesWriter(self, append=(mode == "ab"), inflight=inflight)
+        if(mode != "rb"):
+            raise ValueError(f"invalid mode: {mode!r}")
+        chuncs, starts = self._offsets()
+        sizes = [b - a for a, b in zip(starts, starts[1:])]
+        return ChunkReader([c.fetch for c in chuncs], sizes, read_ahead, memory)
     
     def from_file(self, file, change_last=True):
 
         def f():
+            # the upload started by the constructor must be in place before the chunk list is extended
+            self.headers_lock.wait()
             with self.lock:
-                cl = False
-                if isinstance(file, str):
-                    file_obj = open(file, "rb")
-                    cl = True
-                else:
-                    file_obj = file
-
-                change_last_flag = change_last and len(self.chuncs) > 0
-                if change_last_flag:
-                    last = self.chuncs[-1]
-                    last.set(func=lambda last=last, data=file_obj.read(len(last.get())): last.get() + data)
-
-                ci = cn = 0
-                while (data := file_obj.read(FILE_SIZE)):
-                    if cn != self.cache_limit:
-                        self.chuncs.append(Chunk().set(data))
-                        cn += 1
-                    else:
-                        def fun(chunc: Chunk = self.chuncs[ci], data=data):
-                            chunc.id.wait_for_unlock()
-                            chunc.clear()
-                            return data
-                        self.chuncs.append(Chunk().set(func=fun))
-                        ci += 1
-                    if self.cache_limit != -1:
-                        self.cache_queue.put(self.chuncs[-1])
-                        self.gc()
-                if cl:
-                    file_obj.close()
-
-                self.header_upload()
-
-        t = threading.Thread(target=f)
-        t.start()
+                # local files are mapped and sent as views of the map, anything else is streamed
+                with mapped(file) as view:
+                    with LinkedBytesWriter(self, append=True, change_last=change_last) as writer:
+                        if view is not None:
+                            writer.write_view(view)
+                        elif isinstance(file, str):
+                            with open(file, "rb") as file_obj:
+                                shutil.copyfileobj(file_obj, writer, COPY_BUFFER)
+                        else:
+                            shutil.copyfileobj(file, writer, COPY_BUFFER)
+
+        self._append(f)
         return self
 
+    def _append(self, f):
+        """Runs append `f` on the write pool; `appended` is cleared until every pending one is done."""
+        def th():
+            try:
+                f()
+            except BaseException as e:
+                with self._appending_lock:
+                    self._appending -= 1
+                    self.appended.fail(e)
+                raise
+            with self._appending_lock:
+                self._appending -= 1
+                if(not self._appending and self.appended.error is None):
+                    self.appended.set()
+
+        with self._appending_lock:
+            if(not self._appending):
+                self.appended.clear()
+            self._appending += 1
+        submit_write(th)
+
+
+class LinkedBytesWriter(io.RawIOBase):
+    """Writable stream into a LinkedBytes.
+
+    Data is cut into FILE_SIZE chunks and each full chunk starts uploading
+    right away (getbot spreads them over the bots); at most `inflight` chunks
+    (by default one per bot, see config.upload_window) upload at once, so
+    write() blocks the producer instead of buffering the file. Uploaded chunks
+    are not kept in memory. close() sends the last partial chunk, waits for
+    every upload and writes the manifest, replacing the data or, with `append`,
+    extending it (`change_last` first refills the last existing chunk). Until
+    then readers see the old data. abort(), which a `with` block calls when it
+    raises, drops the writes instead."""
+
+    def __init__(self, target: LinkedBytes, append=False, change_last=False, inflight=None):
+        super().__init__()
+        self.target = target
+        self.append = append
+        self.inflight = upload_window(inflight)
+        self._buffer = bytearray()
+        self._chuncs: list[Chunk] = []
+        self._uploading = deque()
+        self._replaced = None
+        # an upload or download still running would overwrite the chunk list on close
+        target.headers_lock.wait()
+        if(append and change_last):
+            with target.lock:
+                if(target.chuncs):
+                    self._replaced = target.chuncs[-1]
+                    self._buffer += self._replaced.get()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._checkClosed()
+        data = memoryview(data).cast("B")
+        size = len(data)
+        while len(data):
+            room = FILE_SIZE - len(self._buffer)
+            self._buffer += data[:room]
+            data = data[room:]
+            if(len(self._buffer) >= FILE_SIZE):
+                self._send()
+        return size
+
+    def write_view(self, view):
+        """Like write(), but the chunks are sent as slices of `view` without copying.
+
+        `view` must stay valid and unchanged until close() returns (a read-only
+        mmap of a file, for instance). Only what tops up a partial chunk left by
+        earlier writes is copied."""
+        self._checkClosed()
+        view = memoryview(view).cast("B")
+        size = len(view)
+        if(self._buffer):
+            top = min(len(view), FILE_SIZE - len(self._buffer))
+            self.write(view[:top])
+            view = view[top:]
+            # a full buffer goes out before the view so the chunks stay in order
+            if(len(self._buffer) >= FILE_SIZE):
+                self._send()
+        for i in range(0, len(view), FILE_SIZE):
+            self._send(view[i:i + FILE_SIZE])
+        return size
+
+    def _send(self, data=None):
+        if(data is None):
+            data, self._buffer = bytes(self._buffer), bytearray()
+        while len(self._uploading) >= self.inflight:
+            self._uploading.popleft().id.resolve()
+        chunk = Chunk().set(data, save=False)
+        self._chuncs.append(chunk)
+        self._uploading.append(chunk)
+
+    def __exit__(self, exc_type, exc, tb):
+        if(exc_type is not None):
+            self.abort()
+        else:
+            self.close()
+
+    def abort(self):
+        """Closes the writer leaving the target and its manifest untouched."""
+        if(self.closed):
+            return
+        try:
+            # uploads still running may be reading views the caller is about to release
+            while self._uploading:
+                try:
+                    self._uploading.popleft().id.resolve()
+                except Exception:
+                    pass
+            self._buffer = bytearray()
+        finally:
+            super().close()
+
+    def close(self):
+        if(self.closed):
+            return
+        try:
+            if(self._buffer):
+                self._send()
+            while self._uploading:
+                self._uploading.popleft().id.resolve()
+            target = self.target
+            with target.lock:
+                if(not self.append):
+                    target.chuncs = self._chuncs
+                elif(self._replaced is not None and target.chuncs and target.chuncs[-1] is self._replaced):
+                    target.chuncs = target.chuncs[:-1] + self._chuncs
+                else:
+                    target.chuncs = target.chuncs + self._chuncs
+                target.header_upload()
+        finally:
+            super().close()
+
 
 class SimpleBytes:
-    def __init__(self, value=None, id=None, init_symbol="c"):
+    def __init__(self, value=None, id=None, init_symbol="c", codec=None):
         self.init_symbol = init_symbol
+        self.codec = get_codec(codec)
         if(value != None):
-            self._chain = Chain((to_str(value) if value != None else None), id=id, init=init_symbol + "s")
+            self._chain = Chain(self.codec.encode(value), id=id, init=init_symbol + "s", codec=self.codec.tag)
         else:
-            self._chain = Chain(id=id, init=init_symbol + "s")
+            self._chain = Chain(id=id, init=init_symbol + "s", codec=self.codec.tag)
     
     def get(self):
-        return to_bytes(self._chain.get())
+        text = self._chain.get()
+        # chains written before codecs were recorded carry no tag and are base64
+        return get_codec(self._chain.codec or BASE64).decode(text)
 
     def set(self, value):
-        self._chain.set(to_str(value))
+        self._chain.codec = self.codec.tag
+        self._chain.set(self.codec.encode(value))
 
     @property
     def id(self):
@@ -470,5 +779,23 @@ class SimpleBytes:
     def __bytes__(self):
         return self.get()
 
+    def __len__(self):
+        return len(self.get())
+
+    def open(self, mode="rb", read_ahead=READ_AHEAD, memory=MEMORY_BUDGET, inflight=None):
+        if(mode != "rb"):
+            raise ValueError("SimpleBytes is opened for reading only, write streams through Bytes or LinkedBytes")
+        return io.BytesIO(self.get())
+
+    def read(self, offset=0, length=None):
+        data = self.get()
+        return bytearray(data[offset:] if length is None else data[offset:offset + length])
+
+    def readinto(self, buffer, offset=0):
+        out = memoryview(buffer).cast("B")
+        data = memoryview(self.get())[offset:offset + len(out)]
+        out[:len(data)] = data
+        return len(data)
+
     def __repr__(self):
         return str(bytes(self))
\ No newline at end of file
@@ -1,220 +1,362 @@
-from .id_class import Id
-from .config import getbot, getbot_id
+from .id_class import Id, PACKED_PREFIX, pack_ids, parse_ids
+from .config import getbot, getbot_id, get_texts, defer, undefer
 from .config import Bot
 from .bytes_string import *
+from .executor import submit_read, submit_write, call_later, result_of, Ready
 import threading
-import time
 import queue
 
+# counter mode: in-place arithmetic is written back after COUNTER_INTERVAL
+# seconds or COUNTER_THRESHOLD operations, whichever comes first
+COUNTER_INTERVAL = 1.0
+COUNTER_THRESHOLD = 1000
+
 class Int:
-    def __init__(self, value=None, id=None):
-        self.uploading = queue.Queue()
+    """Integer kept in a message.
+
+    With counter=True, in-place arithmetic only changes the local value and is
+    written back on a timer or after flush_threshold operations (see flush()).
+    With shards > 1 the value is stored as partial sums in that many messages,
+    spread over bots; the Int's own message lists them and readers add them up.
+    Each write puts the whole local difference into the shard whose bot is free
+    first, so frequent writes are not limited by the edit rate of one chat.
+
+    +, -, *, // and % return transient Ints: they have no message until
+    persist() is called, their id is read, or they are stored in a Var or List.
+
+    `loaded` is ready once the value is known and `stored` once the message id
+    is; both carry the error of a failed download or upload."""
+
+    def __init__(self, value=None, id=None, *, counter=False, shards=1, flush_interval=COUNTER_INTERVAL, flush_threshold=COUNTER_THRESHOLD, transient=False):
         self.downloading = queue.Queue()
+        self.lock = threading.Lock()
+        self._uploading = False
+        self._reupload = False
+        self._written = None
+        self.counter = counter
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._ops = 0
+        self._scheduled = False
+        self.shards = shards
+        self._shards = None
+        self._shard_values = None
+        self._next_shard = 0
+        self.transient = transient
+        self.loaded = Ready()
+        self.stored = Ready()
         if(value == None):
             self.value = None
-            try:
-                self._id = Id(id)
-                self.download()
-            except:
-                self._id = None
-                self.download()
+            self._id = Id(id) if id != None else None
+            if(self._id != None):
+                self.stored.set()
+            self.download()
         else:
             if(type(value) == int):
                 self.value = value
             else:
                 self.value = int(value)
+            self.loaded.set()
 
             if(id != None):
                 self._id = Id(id)
+                self.stored.set()
             else:
                 self._id = None
-            self.upload()
+            if(not transient):
+                self.upload()
     
     def set(self, value):
         self.value = value
-        self.upload()
+        self.loaded.set()
+        if(not self.transient):
+            self.upload()
+
+    def persist(self):
+        """Sends a transient Int (the result of arithmetic) to storage."""
+        if(self.transient):
+            self.upload()
+        return self
     
+    def wait(self, timeout=None):
+        """Blocks until the value is loaded; re-raises the error if loading failed."""
+        self.loaded.wait(timeout)
+        return self
+
     def download(self):
         self.value = None
+        self.loaded.clear()
         if(self.downloading.empty()):
-            threading.Thread(target=self.tdownload).start()
+            submit_read(self.tdownload)
         else:
             self.downloading.put(1)
 
     def tdownload(self):
-        if(self._id == None):
-            return
-        text = getbot_id(self._id).get_text(self._id)
-        if(text[0] == 'i'):
-            self.value = bytes_int(to_bytes(text[1:]))
-        else:
-            
-            raise Exception(f"Error: {self._id} is not a number!")
+        try:
+            if(self._id == None):
+                raise ValueError("Int has neither a value nor a message to load it from")
+            text = getbot_id(self._id).get_text(self._id)
+            if(text[:2] == 'i' + SHARDS_TAG or text.startswith('i' + OLD_SHARDS_TAG)):
+                shards = parse_ids(text[2:])
+                values = [text_int(t) for t in get_texts(shards)]
+                self._shards, self._shard_values, self.shards = shards, values, len(shards)
+                self.value = sum(values)
+            elif(text[0] == 'i'):
+                self.value = text_int(text)
+            else:
+                
+                raise Exception(f"Error: {self._id} is not a number!")
+        except BaseException as e:
+            self.loaded.fail(e)
+            raise
+        self.loaded.set()
         if(not self.downloading.empty()):
             while not self.downloading.empty():
                 self.downloading.get()
-            threading.Thread(target=self.tdownload).start()
+            submit_read(self.tdownload)
+
+    def _changed(self):
+        """Called after in-place arithmetic: uploads now, or later in counter mode."""
+        if(self.transient):
+            return
+        if(not self.counter):
+            self.upload()
+            return
+        with self.lock:
+            self._ops += 1
+            now = self._ops >= self.flush_threshold
+            later = not now and not self._scheduled
+            if(now):
+                self._ops = 0
+            elif(later):
+                self._scheduled = True
+        if(now):
+            self.upload()
+        elif(later):
+            defer(self)
+            call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        """Writes back what counter mode has collected so far."""
+        with self.lock:
+            self._ops = 0
+            self._scheduled = False
+        undefer(self)
+        self.upload()
 
     def upload(self):
-        if(self.uploading.empty()):
-            t = threading.Thread(target=self.tupload, args=(self._id, ))
-            self._id = None
-            t.start()
-        else:
-            self.uploading.put(1)
+        with self.lock:
+            self.transient = False
+            if(self._uploading):
+                self._reupload = True
+                return
+            self._uploading = True
+        submit_write(self.tupload)
 
-    def tupload(self, id):
-        if(isinstance(id, Id)):
-            getbot_id(id).edit_message(id, 'i' + to_str(int_bytes(self.value)))
-        else:
-            bot = getbot()
-            id = Id(bot.bot_index, bot.group_index, bot.send_message('i' + to_str(int_bytes(self.value))))
-        if(not self.uploading.empty()):
-            while not self.uploading.empty():
-                self.uploading.get()
-            threading.Thread(target=self.tupload, args=(self._id, )).start()
-        else:
-            self._id = id
+    def tupload(self):
+        # one upload at a time; changes made meanwhile are sent as a single follow-up edit
+        while True:
+            with self.lock:
+                self._reupload = False
+                id, value = self._id, self.value
+            try:
+                if(self.shards > 1 or self._shards is not None):
+                    id = self._upload_shards(id, value)
+                else:
+                    text = int_text(value)
+                    if(not isinstance(id, Id)):
+                        id = getbot().send_message_id(text)
+                    elif(text != self._written):
+                        getbot_id(id).edit_message(id, text)
+                    self._written = text
+            except BaseException as e:
+                with self.lock:
+                    self._uploading = False
+                if(not self.stored.is_set()):
+                    self.stored.fail(e)
+                raise
+            with self.lock:
+                self._id = id
+                self.stored.set()
+                if(not self._reupload):
+                    self._uploading = False
+                    return
+
+    def _upload_shards(self, id, value):
+        if(self._shards is None):
+            values = [value] + [0] * (self.shards - 1)
+            futures = [submit_write(lambda text: getbot().send_message_id(text), int_text(v)) for v in values]
+            self._shards, self._shard_values = [result_of(f) for f in futures], values
+            text = 'i' + SHARDS_TAG + pack_ids(self._shards)
+            if(isinstance(id, Id)):
+                getbot_id(id).edit_message(id, text)
+            else:
+                id = getbot().send_message_id(text)
+            return id
+        delta = value - sum(self._shard_values)
+        if(delta):
+            # the shard whose bot frees up first, taking turns among equally free ones
+            n = len(self._shards)
+            k = min(range(n), key=lambda k: (round(getbot_id(self._shards[k]).free_in(), 2), (k - self._next_shard) % n))
+            self._next_shard = k + 1
+            self._shard_values[k] += delta
+            getbot_id(self._shards[k]).edit_message(self._shards[k], int_text(self._shard_values[k]))
+        return id
     
     @property
     def id(self):
-        while(self._id == None):
-            time.sleep(0.2)
+        self.persist()
+        self.stored.wait()
         return self._id
     
     @id.setter
     def id(self, value):
         self._id = Id(value)
+        self.stored.set()
         self.download()
     
     def __iadd__(self, other):
         if(type(other) == int):
             self.value += other
-            self.upload()
+            self._changed()
             return self
         elif(type(other) == Int):
             self.value += other.value
-            self.upload()
+            self._changed()
             return self
         else:
             raise Exception("Not an int!")
     
     def __add__(self, other):
         if(type(other) == int):
-            return Int(self.value + other)
+            return Int(self.value + other, transient=True)
         elif(type(other) == Int):
-            return Int(self.value + other.value)
+            return Int(self.value + other.value, transient=True)
         else:
             raise Exception("Not an int!")
         
     def __isub__(self, other):
         if(type(other) == int):
             self.value -= other
-            self.upload()
+            self._changed()
             return self
         elif(type(other) == Int):
             self.value -= other.value
-            self.upload()
+            self._changed()
             return self
         else:
             raise Exception("Not an int!")
     
     def __sub__(self, other):
         if(type(other) == int):
-            return Int(self.value - other)
+            return Int(self.value - other, transient=True)
         elif(type(other) == Int):
-            return Int(self.value - other.value)
+            return Int(self.value - other.value, transient=True)
         else:
             raise Exception("Not an int!")
         
     def __imul__(self, other):
         if(type(other) == int):
             self.value *= other
-            self.upload()
+            self._changed()
             return self
         elif(type(other) == Int):
             self.value *= other.value
-            self.upload()
+            self._changed()
             return self
         else:
             raise Exception("Not an int!")
     
     def __mul__(self, other):
         if(type(other) == int):
-            return Int(self.value * other)
+            return Int(self.value * other, transient=True)
         elif(type(other) == Int):
-            return Int(self.value * other.value)
+            return Int(self.value * other.value, transient=True)
         else:
             raise Exception("Not an int!")
         
     def __ifloordiv__(self, other):
         if(type(other) == int):
             self.value //= other
-            self.upload()
+            self._changed()
             return self
         elif(type(other) == Int):
             self.value //= other.value
-            self.upload()
+            self._changed()
             return self
         else:
             raise Exception("Not an int!")
     
     def __floordiv__(self, other):
         if(type(other) == int):
-            return Int(self.value // other)
+            return Int(self.value // other, transient=True)
         elif(type(other) == Int):
-            return Int(self.value // other.value)
+            return Int(self.value // other.value, transient=True)
         else:
             raise Exception("Not an int!")
     
     def __imod__(self, other):
         if(type(other) == int):
             self.value %= other
-            self.upload()
+            self._changed()
             return self
         elif(type(other) == Int):
             self.value %= other.value
-            self.upload()
+            self._changed()
             return self
         else:
             raise Exception("Not an int!")
     
     def __mod__(self, other):
         if(type(other) == int):
-            return Int(self.value % other)
+            return Int(self.value % other, transient=True)
         elif(type(other) == Int):
-            return Int(self.value % other.value)
+            return Int(self.value % other.value, transient=True)
         else:
             raise Exception("Not an int!")
 
     def __str__(self):
-        while(self.value == None):
-            time.sleep(0.05)
+        self.loaded.wait()
         return str(self.value)
 
     def __repr__(self):
-        while(self.value == None):
-            time.sleep(0.05)
+        self.loaded.wait()
         return 'i' + str(self.value)
     
     def __int__(self):
-        while(self.value == None):
-            time.sleep(0.05)
+        self.loaded.wait()
         return int(self.value)
 
 
-def int_bytes_g(a):
-    while a > 0:
-        yield a % 256
-        a //= 256
+# Message forms of an Int:
+#   'i:' + decimal, for values up to DECIMAL_BITS bits ('i:0', 'i:-42')
+#   'i!' + codec tag + codec text of the big-endian two's complement bytes
+#   'i' + base64 of the little-endian magnitude, written by older versions
+#   'i*' + packed ids of shard messages holding partial sums, see Int
+#   'i+' + packed ids, the same, as first written; '+' is a base64 character,
+#   so only '+' followed by the packed ids' prefix (never base64) is a shard list
+DECIMAL_TAG = ':'
+BINARY_TAG = '!'
+SHARDS_TAG = '*'
+OLD_SHARDS_TAG = '+' + PACKED_PREFIX
+DECIMAL_BITS = 256
 
 def int_bytes(a:int) -> bytes:
-    return bytes(int_bytes_g(a))
+    return a.to_bytes(a.bit_length() // 8 + 1, "big", signed=True)
 
 def bytes_int(a:bytes) -> int:
-    c = 1
-    o = 0
-    for num in a:
-        o += num * c
-        c *= 256
-    return o
\ No newline at end of file
+    return int.from_bytes(a, "big", signed=True)
+
+def int_text(a:int, codec=None) -> str:
+    if(a.bit_length() <= DECIMAL_BITS):
+        return 'i' + DECIMAL_TAG + str(a)
+    codec = get_codec(codec)
+    return 'i' + BINARY_TAG + codec.tag + codec.encode(int_bytes(a))
+
+def text_int(text:str) -> int:
+    tag = text[1:2]
+    if(tag == DECIMAL_TAG):
+        return int(text[2:])
+    if(tag == BINARY_TAG):
+        return bytes_int(get_codec(text[2]).decode(text[3:]))
+    return int.from_bytes(to_bytes(text[1:]), "little")
\ No newline at end of file
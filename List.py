@@ -1,11 +1,17 @@
-from .id_class import Id
-from .config import getbot, getbot_id
+from .id_class import Id, IdPacker, pack_ids, parse_ids
+from .config import getbot, getbot_id, get_texts, cache
+from .executor import submit_read, submit_write, result_of, Ready
 import threading
 import time
 
 MAX_PAGE_LENGTH = 3900  # лимит длины сообщения Telegram
 
 
+def _prefetch_batch():
+    """Сколько текстов читать заранее за раз: половина кеша, вторая — под чтения Var."""
+    return max(1, cache.max_entries // 2)
+
+
 class List:
     """Асинхронный Telegram List с авто-синхронизацией Var, безопасным ожиданием загрузки и лимитом кеша страниц."""
 
@@ -13,8 +19,11 @@ class List:
         self._id = None
         self.pages = []
         self.page_data = {}
+        self._page_sizes = {}  # число элементов каждой прочитанной страницы (остаётся после вытеснения)
         self.items = []
         self.lock = threading.RLock()
+        self.loaded = Ready()  # главная страница и все страницы прочитаны (или их нет)
+        self.stored = Ready()  # id главной страницы известен
 
         # Upload control
         self._uploading = False
@@ -27,30 +36,25 @@ class List:
 
         if id is not None:
             self._id = Id(id)
-            threading.Thread(target=self.download, daemon=True).start()
+            self.stored.set()
+            submit_read(self.download)
         elif value is not None:
+            self.loaded.set()
             self._add_iterable(value)
             self.schedule_upload()
         else:
+            self.loaded.set()
             self.schedule_upload()
 
     # ==== Helpers ====
 
-    def _wait_loaded(self):
-        """Ожидает, пока self.items реально загружены (нет None)."""
-        while True:
-            with self.lock:
-                # Считаем загруженным, если пустой или без None
-                ready = bool(self.items) and all(v is not None for v in self.items)
-                empty_new = not self.pages and not self.page_data
-                if ready or empty_new:
-                    return
-            time.sleep(0.05)
+    def _wait_loaded(self, timeout=None):
+        """Ожидает загрузку списка; пробрасывает ошибку загрузки или TimeoutError."""
+        self.loaded.wait(timeout)
 
     def _wait_var_ready(self, v):
-        """Ожидает, пока Var.id не станет готов."""
-        while v.id is None:
-            time.sleep(0.05)
+        """Ожидает, пока Var.id не станет готов, и возвращает его."""
+        return Id(v.id)
 
     def _add_iterable(self, iterable):
         """Добавляет элементы из iterable, распаковывая вложенные списки/кортежи."""
@@ -70,21 +74,13 @@ class List:
         newv._parent = self
         return newv
 
-    def _split_pages(self):
-        """Разделяет список на страницы с учётом лимита Telegram."""
-        pages, current = [], []
-        length = 2
-        for v in self.items:
-            self._wait_var_ready(v)
-            line = v.id.to_str() + "\n"
-            if length + len(line) > MAX_PAGE_LENGTH:
-                pages.append(current)
-                current = []
-                length = 2
-            current.append(v)
-            length += len(line)
-        if current:
-            pages.append(current)
+    def _split_pages(self, ids):
+        """Разделяет ids на страницы (упакованные IdPacker) с учётом лимита Telegram."""
+        pages = []
+        for idd in ids:
+            if not pages or not pages[-1].add(idd, MAX_PAGE_LENGTH - 2):
+                pages.append(IdPacker())
+                pages[-1].add(idd)
         return pages
 
     # ==== Upload control ====
@@ -97,29 +93,37 @@ class List:
                 return
             self._uploading = True
             self._reschedule_upload = False
-            threading.Thread(target=self._upload_worker, daemon=True).start()
+            submit_write(self._upload_worker)
 
     def _upload_worker(self):
         try:
             self.upload()
+        except BaseException as e:
+            if not self.stored.is_set():
+                self.stored.fail(e)
+            raise
         finally:
             with self.lock:
                 if self._reschedule_upload:
                     self._reschedule_upload = False
-                    threading.Thread(target=self._upload_worker, daemon=True).start()
+                    submit_write(self._upload_worker)
                 else:
                     self._uploading = False
 
     def upload(self):
         """Синхронная выгрузка структуры списка (без содержимого Var)."""
         self._wait_loaded()
+        with self.lock:
+            items = list(self.items)
+        # id элементов ждём без блокировки, чтобы не мешать append и чтению
+        ids = [self._wait_var_ready(v) for v in items]
         with self.lock:
             bot = getbot()
-            pages = self._split_pages()
+            pages = self._split_pages(ids)
             new_page_ids = []
 
             for pg in pages:
-                text = "P\n" + "".join(v.id.to_str() + "\n" for v in pg)
+                text = "P\n" + pg.text()
                 if len(self.pages) > len(new_page_ids):
                     pid = self.pages[len(new_page_ids)]
                     getbot_id(pid).edit_message(pid, text)
@@ -130,10 +134,11 @@ class List:
             self.pages = new_page_ids
 
             # Обновляем главную страницу
-            meta = "L" + str(len(self.items)) + "\n" + "\n".join(p.to_str() for p in self.pages)
+            meta = "L" + str(len(ids)) + "\n" + pack_ids(self.pages)
             if self._id is None:
                 msg_id = bot.send_message(meta)
                 self._id = Id(bot.bot_index, bot.group_index, msg_id)
+                self.stored.set()
             else:
                 getbot_id(self._id).edit_message(self._id, meta)
 
@@ -141,36 +146,35 @@ class List:
 
     def download(self):
         """Загружает главную страницу и страницы."""
+        try:
+            self._download()
+        except BaseException as e:
+            self.loaded.fail(e)
+            raise
+        self.loaded.set()
+
+    def _download(self):
         if self._id is None:
             return
 
-        # Попытка получить мета-текст
-        text = ""
-        for _ in range(50):  # до 5 секунд
-            try:
-                text = getbot_id(self._id).get_text(self._id)
-                if text and text.strip():
-                    break
-            except Exception:
-                pass
-            time.sleep(0.1)
-
+        text = getbot_id(self._id).get_text(self._id)
         if not text or not text.startswith("L"):
-            print(f"[WARN] Invalid or missing list meta for {self._id}")
-            return
+            raise ValueError(f"Invalid or missing list meta for {self._id}")
 
         lines = text.strip().splitlines()
-        self.pages = [Id().from_str(x) for x in lines[1:]]
+        self.pages = parse_ids("\n".join(lines[1:]))
         self.items = [None] * int(lines[0][1:])
 
-        threads = []
-        for page_id in self.pages:
-            t = threading.Thread(target=self._download_page, args=(page_id,), daemon=True)
-            t.start()
-            threads.append(t)
-
-        for t in threads:
-            t.join()
+        # все страницы одним пакетом, дальше _download_page читает их из кеша
+        get_texts(self.pages)
+        if len(self.items) <= _prefetch_batch():
+            futures = [submit_read(self._download_page, page_id) for page_id in self.pages]
+            for f in futures:
+                result_of(f)
+        else:
+            # параллельные страницы вытеснили бы друг друга из кеша до чтения
+            for page_id in self.pages:
+                self._download_page(page_id)
 
     def _download_page(self, page_id: Id):
         from .Var import Var
@@ -185,16 +189,23 @@ class List:
         if not lines or lines[0] != "P":
             return
 
+        ids = parse_ids("\n".join(lines[1:]))
         vars_ = []
-        for x in lines[1:]:
-            if x.strip():
-                v = Var(id=Id().from_str(x.strip()))
+        # прогреваем кеш, чтобы Var(id=...) не пересылали сообщения по одному;
+        # пачками меньше кеша, иначе первые тексты вытесняются до чтения
+        batch = _prefetch_batch()
+        for start in range(0, len(ids), batch):
+            part = ids[start:start + batch]
+            get_texts(part)
+            for item_id in part:
+                v = Var(id=item_id)
                 v._parent = self
                 vars_.append(v)
 
         with self.lock:
             # добавляем страницу в кеш
             self.page_data[page_id] = vars_
+            self._page_sizes[page_id] = len(vars_)
             self._page_access[page_id] = time.time()
 
             # очищаем лишние страницы
@@ -206,8 +217,11 @@ class List:
                 if pid in self.page_data:
                     flat.extend(self.page_data[pid])
                 else:
-                    flat.extend([None] * len(vars_))  # placeholder
-            self.items = flat[:len(self.items)]
+                    # placeholder; страницы читаются параллельно, и размер ещё не
+                    # прочитанной неизвестен — длину списка это не должно менять
+                    flat.extend([None] * self._page_sizes.get(pid, len(vars_)))
+            count = len(self.items)
+            self.items = flat[:count] + [None] * (count - len(flat))
 
     def _enforce_cache_limit_locked(self):
         """Удаляет старые страницы, если кеш превышает лимит."""
@@ -271,9 +285,7 @@ class List:
 
         # Если страницы нет в кеше — загружаем заново
         if pid not in self.page_data:
-            threading.Thread(target=self._download_page, args=(pid,), daemon=True).start()
-            while pid not in self.page_data:
-                time.sleep(0.05)
+            self._download_page(pid)
         else:
             # Обновляем "время последнего доступа"
             with self.lock:
@@ -316,12 +328,10 @@ class List:
         self._wait_loaded()
         result = []
         for item in self.items:
-            self._wait_var_ready(item)
             result.append(item.get())
         return result
 
     @property
     def id(self):
-        while self._id is None:
-            time.sleep(0.05)
+        self.stored.wait()
         return self._id
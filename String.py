@@ -1,9 +1,16 @@
-from .id_class import Id
-from .config import getbot, getbot_id, Bot
+from .id_class import Id, POINTER_RESERVE
+from .config import getbot, getbot_id, upload_window, Bot, dump_links, load_links
+from .stream import ChunkReader, mapped, READ_AHEAD, MEMORY_BUDGET, COPY_BUFFER
+from .manifest import chunk_info, check_chunk, chunk_table, totals, split_table, read_table, split_chunks
 from .bytes_string import *
+from codecs import getincrementaldecoder
+from .executor import submit_read, submit_write, map_write, result_of, Ready
+from itertools import accumulate
 import threading
-import time
+import bisect
+import shutil
 import queue
+import io
 
 # Constants
 FILE_SIZE = 16000000
@@ -13,7 +20,21 @@ CONTINUATION_PREFIX = 'c'
 TEXT_PREFIX = 't'
 END_MARKER = 'e'
 MAX_MESSAGE_LENGTH = 3900
-SLEEP_INTERVAL = 0.05
+
+def _utf8_length(data):
+    """Characters in UTF-8 `data`, or None when it is not valid UTF-8.
+
+    Checked COPY_BUFFER bytes at a time, so a chunk is never decoded whole."""
+    decoder = getincrementaldecoder("utf-8")()
+    view = memoryview(data)
+    chars = 0
+    try:
+        for start in range(0, len(view), COPY_BUFFER):
+            chars += len(decoder.decode(view[start:start + COPY_BUFFER]))
+        chars += len(decoder.decode(b"", final=True))
+    except UnicodeDecodeError:
+        return None
+    return chars
 
 
 class Str:
@@ -34,6 +55,11 @@ class Str:
           - file: open file-like object
           - path: path to file
         """
+        if (isinstance(value, str) and id is None and file is None and path is None
+                and isinstance(self._obj, SimpleString) and len(value) <= self.MAX_SIMPLE):
+            # та же короткая строка: редактируем своё сообщение, а не создаём новое
+            self._obj.set(value)
+            return
         self._init_core(value=value, id=id, file=file, path=path)
 
     def _init_core(self, value=None, id=None, file=None, path=None):
@@ -115,6 +141,10 @@ class Str:
         """
         self._obj.save(target)
 
+    def open(self, read_ahead=READ_AHEAD, memory=MEMORY_BUDGET):
+        """Seekable text reader over the string (see LinkedString.open)."""
+        return self._obj.open(read_ahead, memory)
+
     def get(self):
         """Get the current string value."""
         return str(self._obj)
@@ -126,7 +156,7 @@ class Str:
         return repr(self._obj)
 
     def __len__(self):
-        return len(str(self._obj))
+        return len(self._obj)
 
     def __getitem__(self, key):
         return str(self._obj)[key]
@@ -198,7 +228,7 @@ class LinkedString:
     stored across multiple messages if needed.
     """
     
-    def __init__(self, value=None, id=None, file=None):
+    def __init__(self, value=None, id=None, file=None, path=None):
         """
         Initialize a LinkedString.
 
@@ -206,28 +236,39 @@ class LinkedString:
             value: Initial string value (optional)
             id: Existing Telegram message ID to load from (optional)
             file: Open file-like object to upload directly (without caching in RAM)
+            path: Path to a file to upload directly (memory-mapped, without copies)
         """
-        self.uploading = queue.Queue()
+        self.lock = threading.Lock()
+        self._uploading = False
+        self._reupload = False
         self.downloading = queue.Queue()
         self.linklock = threading.Lock()
-        self.isdownlock = threading.Lock()
-        self.isdownloading = False
         self.pages = []
         self._id = None
         self.links = []
+        self.infos = []         # ChunkInfo per link (None when the manifest has no chunk table)
         self.value = None
+        self.loaded = Ready()   # links (and local chunks) known
+        self.stored = Ready()   # message id known, no upload pending
 
         if file is not None:
             self._upload_from_file(file)
+        elif path is not None:
+            with open(path, "rb") as f:
+                self._upload_from_file(f)
         elif id is not None:
+            self._id = Id(id)
             if value is None:
                 self.value = ""
+                self.stored.set()
                 self.download()
             else:
                 self.value = [value[i:i+FILE_SIZE] for i in range(0, len(value), FILE_SIZE)]
+                self.loaded.set()
                 self.upload()
         else:
             self.value = "" if value is None else [value[i:i+FILE_SIZE] for i in range(0, len(value), FILE_SIZE)]
+            self.loaded.set()
             self.upload()
     
     def save(self, target):
@@ -248,49 +289,113 @@ class LinkedString:
             f = target
 
         try:
-            for link in self.links:
-                msg = getbot_id(link).forward(link)
-                file_id = msg.document.file_id
-                bot = getbot_id(link).bot
-                tg_file = bot.get_file(file_id)
-                chunk = bot.download_file(tg_file.file_path)
-                f.write(chunk)
+            with self._raw_reader(READ_AHEAD, MEMORY_BUDGET) as reader:
+                shutil.copyfileobj(reader, f, COPY_BUFFER)
         finally:
             if close_after:
                 f.close()
+
+    def _fetcher(self, index):
+        """Function returning the UTF-8 bytes of chunk `index`, local or downloaded (not cached)."""
+        def fetch():
+            with self.linklock:
+                part = self.value[index] if isinstance(self.value, list) else None
+                link, info = self.links[index], self.infos[index]
+            if part is not None:
+                return part.encode("utf-8")
+            return check_chunk(getbot_id(link).get_document(link), info, link)
+        return fetch
+
+    def _chunk_size(self, index):
+        """Length in bytes of chunk `index` when the manifest has no chunk table: local
+        chunks are measured, stored ones are asked for without downloading them."""
+        with self.linklock:
+            part = self.value[index] if isinstance(self.value, list) else None
+            link = self.links[index]
+        if part is not None:
+            return len(part.encode("utf-8"))
+        return getbot_id(link).get_document_size(link)
+
+    def _raw_reader(self, read_ahead, memory):
+        self.wait()
+        with self.linklock:
+            infos = list(self.infos)
+        fetchers = [self._fetcher(i) for i in range(len(infos))]
+        sizes = [info.size if info is not None else None for info in infos]
+        unknown = {i: submit_read(self._chunk_size, i) for i, size in enumerate(sizes) if size is None}
+        for i, future in unknown.items():
+            sizes[i] = result_of(future)
+        return ChunkReader(fetchers, sizes, read_ahead, memory)
+
+    def open(self, read_ahead=READ_AHEAD, memory=MEMORY_BUDGET):
+        """Seekable text reader streaming the chunks, `read_ahead` of them downloading
+        in parallel within `memory` bytes; chunks it fetches are not cached."""
+        return io.TextIOWrapper(io.BufferedReader(self._raw_reader(read_ahead, memory)), encoding="utf-8")
     
     def _upload_from_file(self, file_obj):
         """
         Upload data from an already opened file-like object directly to Telegram.
-        Does not keep data in RAM.
+        Does not keep data in RAM: a local file is memory-mapped and its chunks
+        are sent as views of the map, other streams are read at most upload_window()
+        chunks ahead of the uploads. Uploads go out in parallel over all bots.
         """
-        bot = getbot()
-        self.links = []
-
-        # читаем кусками и отправляем каждый как документ
-        while True:
-            chunk = file_obj.read(FILE_SIZE)
-            if not chunk:
-                break
-            if isinstance(chunk, str):
-                chunk = chunk.encode("utf-8")
-            doc_id = bot.send_document_id(chunk)
-            self.links.append(doc_id)
-
-        pages = self._split_links_into_pages(self.links)
-        continuation_id = None
-        self.pages = []
-
-        for page in pages[:0:-1]:
-            continuation_id = bot.send_message_id(
-                TEXT_PREFIX + (f'{CONTINUATION_PREFIX} {continuation_id.to_str()} ' if continuation_id else '') + page
-            )
-            self.pages.append(continuation_id)
+        def chunks():
+            # читаем кусками и отправляем каждый как документ;
+            # байты режем по границе символа, чтобы каждый кусок декодировался сам
+            decoder = getincrementaldecoder("utf-8")()
+            carry = b""
+            while True:
+                chunk = file_obj.read(FILE_SIZE)
+                if not chunk:
+                    break
+                if isinstance(chunk, str):
+                    yield chunk.encode("utf-8"), len(chunk)
+                    continue
+                chunk = carry + chunk
+                try:
+                    chars = len(decoder.decode(chunk))
+                    carry = decoder.getstate()[0]
+                    decoder.reset()
+                except UnicodeDecodeError:
+                    # не UTF-8: длину в символах не знаем
+                    chars, carry = None, b""
+                    decoder.reset()
+                if len(chunk) > len(carry):
+                    yield chunk[:len(chunk) - len(carry)], chars
+            if carry:
+                yield carry, None
+
+        links, infos = [], []
+        with mapped(file_obj) as view:
+            if view is not None:
+                sent = map_write(lambda part: self._send_data(part, _utf8_length(part)),
+                                 self._mapped_chunks(view), upload_window())
+            else:
+                sent = map_write(lambda item: self._send_data(*item), chunks(), upload_window())
+            for link, info in sent:
+                links.append(link)
+                infos.append(info)
 
-        main_content = LINKED_STRING_PREFIX + (f'{CONTINUATION_PREFIX} {continuation_id.to_str()} ' if continuation_id else '') + pages[0]
-        main_id = bot.send_message_id(main_content)
-        self.pages.append(main_id)
-        self._id = main_id
+        with self.linklock:
+            self.links, self.infos = links, infos
+        self._write_pages(links, infos)
+        self.value = None
+        self.loaded.set()
+        self.stored.set()
+
+    def _mapped_chunks(self, view):
+        """Slices of a mapped file of at most FILE_SIZE bytes, cut on UTF-8 character boundaries."""
+        start = 0
+        while start < len(view):
+            end = cut = min(start + FILE_SIZE, len(view))
+            if end < len(view):
+                # не режем многобайтовый символ: отступаем к его первому байту
+                while cut > end - 3 and view[cut] & 0xC0 == 0x80:
+                    cut -= 1
+                if view[cut] & 0xC0 == 0x80:
+                    cut = end  # не UTF-8, режем где угодно
+            yield view[start:cut]
+            start = cut
 
     def set(self, value=None, file=None, path=None):
         """
@@ -312,191 +417,202 @@ class LinkedString:
         if value is None:
             value = ""
         self.value = [value[i:i+FILE_SIZE] for i in range(0, len(value), FILE_SIZE)]
+        self.loaded.set()
         self.upload()
 
     def download(self):
         """Queue a download operation to fetch the string from Telegram."""
+        self.loaded.clear()
         if self.downloading.empty():
-            threading.Thread(target=self.tdownload, daemon=True).start()
+            submit_read(self.tdownload)
         else:
             self.downloading.put(1)
 
     def tdownload(self):
         """Worker thread for downloading string data from Telegram."""
-        with self.isdownlock:
-            self.isdownloading = True
-        
-        if self._id is None:
-            with self.isdownlock:
-                self.isdownloading = False
-            return
-        
-        text = getbot_id(self._id).get_text(self._id)
-        self.pages = [self._id]
-        
-        if text[:2] == LINKED_STRING_PREFIX:
-            text = text[2:]
-            with self.linklock:
-                self.links = []
-                while text and text[0] == CONTINUATION_PREFIX:
-                    next_id = None
-                    for id_str in text[1:].split():
-                        current_id = Id().from_str(id_str)
-                        if next_id is None:
-                            next_id = current_id
-                            self.pages.append(current_id)
-                        else:
-                            self.links.append(current_id)
+        try:
+            if self._id is None:
+                raise ValueError("LinkedString has neither a value nor a message to load it from")
+
+            text = getbot_id(self._id).get_text(self._id)
+            pages = [self._id]
+
+            if text[:2] == LINKED_STRING_PREFIX:
+                text = text[2:]
+                links, infos = [], []
+                total = None
+                first = True
+                while True:
+                    more = text[:1] == CONTINUATION_PREFIX
+                    body, table = split_table(text[1:] if more else text)
+                    ids = load_links(body)
+                    page_links = ids[1:] if more else ids
+                    page_total, page_infos = read_table(table, len(page_links), first)
+                    if first:
+                        total, first = page_total, False
+                    links.extend(page_links)
+                    infos.extend(page_infos)
+                    if not more:
+                        break
+                    next_id = ids[0]
+                    pages.append(next_id)
                     text = getbot_id(next_id).get_text(next_id)[1:]
-                
-                self.pages.reverse()
-                for id_str in text.split():
-                    self.links.append(Id().from_str(id_str))
-                self.value = [None] * len(self.links)
-        else:
-            raise ValueError(f"Message {self._id} is not a linked string (expected prefix '{LINKED_STRING_PREFIX}')")
+
+                if total is not None and totals(infos) != total:
+                    raise ValueError(f"Manifest of {self._id} is corrupted: chunk table does not match its totals")
+                pages.reverse()
+                with self.linklock:
+                    self.pages = pages
+                    self.links, self.infos = links, infos
+                    self.value = [None] * len(links)
+            else:
+                raise ValueError(f"Message {self._id} is not a linked string (expected prefix '{LINKED_STRING_PREFIX}')")
+        except BaseException as e:
+            self.loaded.fail(e)
+            raise
+        self.loaded.set()
         
         if not self.downloading.empty():
             while not self.downloading.empty():
                 self.downloading.get()
-            threading.Thread(target=self.tdownload, daemon=True).start()
-        else:
-            with self.isdownlock:
-                self.isdownloading = False
+            submit_read(self.tdownload)
 
     def upload(self):
         """Queue an upload operation to save the string to Telegram."""
-        if self.uploading.empty():
-            thread = threading.Thread(target=self.tupload, args=(self._id,), daemon=True)
-            self._id = None
-            thread.start()
-        else:
-            self.uploading.put(1)
-
-    def tupload(self, id):
+        with self.lock:
+            self.stored.clear()
+            if self._uploading:
+                self._reupload = True
+                return
+            self._uploading = True
+        submit_write(self.tupload)
+
+    def tupload(self):
         """Worker thread for uploading string data to Telegram.
-        
-        Args:
-            id: Existing message ID to update, or None to create new
+
+        Sends every chunk as a document, then the link pages, and edits the
+        existing main message if there is one. Values set while an upload is
+        running are sent as one follow-up upload.
         """
-        self.pages = []
-        if not isinstance(id, Id):
-            id = getbot().send_message_id("null")
-        
-        with self.linklock:
-            self.links = [getbot().send_document_id(part.encode('utf-8')) for part in self.value]
-            pages = self._split_links_into_pages(self.links)
-        
+        while True:
+            with self.lock:
+                self._reupload = False
+                value = self.value
+            try:
+                # chunks go out in parallel over all bots, links stay in order
+                sent = list(map_write(self._send_chunk, value, upload_window()))
+                links, infos = [link for link, _ in sent], [info for _, info in sent]
+                with self.linklock:
+                    self.links, self.infos = links, infos
+                self._write_pages(links, infos)
+            except BaseException as e:
+                with self.lock:
+                    self._uploading = False
+                    self.stored.fail(e)
+                raise
+            with self.lock:
+                if not self._reupload:
+                    self._uploading = False
+                    self.stored.set()
+                    return
+
+    def _send_chunk(self, part):
+        """Send one chunk of text as a document; returns its link and ChunkInfo."""
+        return self._send_data(part.encode('utf-8'), len(part))
+
+    def _send_data(self, data, chars):
+        """Send encoded chunk `data` with the bot that frees up first; returns its link and ChunkInfo."""
+        return getbot().send_document_id(data), chunk_info(data, chars)
+
+    def _write_pages(self, links, infos):
+        """Send the link pages of `links` and point the main message at them."""
+        pages = self._split_links_into_pages(links, infos)
+        written = []
+
         # Upload continuation pages in reverse order
         continuation_id = None
-        for page in pages[:0:-1]:
+        for page, page_infos in pages[:0:-1]:
             continuation_id = getbot().send_message_id(
-                TEXT_PREFIX + (f'{CONTINUATION_PREFIX} {continuation_id.to_str()} ' if continuation_id else '') + page
-            )
-            self.pages.append(continuation_id)
+                self._page_content(TEXT_PREFIX, continuation_id, page, chunk_table(page_infos)))
+            written.append(continuation_id)
 
         # Upload or update the main page
-        main_content = LINKED_STRING_PREFIX + (f'{CONTINUATION_PREFIX} {continuation_id.to_str()} ' if continuation_id else '') + pages[0]
-        
+        page, page_infos = pages[0]
+        main_content = self._page_content(LINKED_STRING_PREFIX, continuation_id, page,
+                                          chunk_table(page_infos, totals(infos)))
+        id = self._id
         if isinstance(id, Id):
             getbot_id(id).edit_message(id, main_content)
-            self.pages.append(id)
         else:
-            id = getbot_id(id).send_message_id(main_content)
-            self.pages.append(id)
-        
-        if not self.uploading.empty():
-            while not self.uploading.empty():
-                self.uploading.get()
-            threading.Thread(target=self.tupload, args=(id,), daemon=True).start()
-        else:
-            self._id = id
+            id = getbot().send_message_id(main_content)
+        written.append(id)
+        self.pages = written
+        self._id = id
     
-    def _split_links_into_pages(self, links):
+    def _split_links_into_pages(self, links, infos):
         """Split links into pages that fit within message size limits.
         
         Args:
             links: List of Id objects to split into pages
+            infos: ChunkInfo of every link (or None where unknown)
             
         Returns:
-            List of strings, each containing space-separated link IDs
+            List of (ids, infos) pairs, each small enough for one page once
+            packed together with a continuation pointer and the chunk table
         """
-        pages = []
-        current_page = ""
-        
-        for link in links:
-            link_str = link.to_str()
-            if len(current_page + link_str) > MAX_MESSAGE_LENGTH:
-                if current_page:
-                    pages.append(current_page.strip())
-                current_page = link_str
+        return split_chunks(links, infos, MAX_MESSAGE_LENGTH - POINTER_RESERVE)
+
+    def _page_content(self, prefix, continuation_id, links, table=""):
+        """Text of one link page: prefix, continuation marker, the packed links
+        and the chunk table of those links.
+
+        The continuation pointer, when there is one, is the first packed id."""
+        if continuation_id is None:
+            return prefix + dump_links(links) + table
+        return prefix + CONTINUATION_PREFIX + dump_links([continuation_id] + links) + table
+
+    def link_upload(self):
+        """Upload only the link structure without re-uploading documents."""
+        with self.lock:
+            if self._uploading:
+                # the running upload sends the documents and links again anyway
+                self._reupload = True
+                return
+            self._uploading = True
+            self.stored.clear()
+        try:
+            with self.linklock:
+                links, infos = list(self.links), list(self.infos)
+            self._write_pages(links, infos)
+        except BaseException as e:
+            with self.lock:
+                self._uploading = False
+                self.stored.fail(e)
+            raise
+        with self.lock:
+            self._uploading = False
+            if self._reupload:
+                submit_write(self.tupload)
+                self._uploading = True
             else:
-                current_page += " " + link_str
-        
-        if current_page:
-            pages.append(current_page.strip())
-        
-        return pages if pages else [""]
-
-    def link_upload(self, id):
-        """Upload only the link structure without re-uploading documents.
-        
-        Args:
-            id: Existing message ID to update, or None to create new
-        """
-        self.pages = []
-        if not isinstance(id, Id):
-            id = getbot().send_message_id("null")
-        
-        with self.linklock:
-            pages = self._split_links_into_pages(self.links)
-        
-        # Upload continuation pages in reverse order
-        continuation_id = None
-        for page in pages[:0:-1]:
-            continuation_id = getbot().send_message_id(
-                TEXT_PREFIX + (f'{CONTINUATION_PREFIX} {continuation_id.to_str()} ' if continuation_id else '') + page
-            )
-            self.pages.append(continuation_id)
-
-        # Upload or update the main page
-        main_content = LINKED_STRING_PREFIX + (f'{CONTINUATION_PREFIX} {continuation_id.to_str()} ' if continuation_id else '') + pages[0]
-        
-        if isinstance(id, Id):
-            getbot_id(id).edit_message(id, main_content)
-            self.pages.append(id)
-        else:
-            id = getbot_id(id).send_message_id(main_content)
-            self.pages.append(id)
-        
-        if not self.uploading.empty():
-            while not self.uploading.empty():
-                self.uploading.get()
-            threading.Thread(target=self.tupload, args=(id,), daemon=True).start()
-        else:
-            self._id = id
+                self.stored.set()
 
     @property
     def id(self):
         """Get the Telegram message ID (waits for upload if needed)."""
-        while not self.uploading.empty() or self._id is None:
-            time.sleep(SLEEP_INTERVAL)
+        self.stored.wait()
         return self._id
     
     @id.setter
     def id(self, value):
         """Set the Telegram message ID and download the string."""
         self._id = Id(value)
+        self.stored.set()
         self.download()
 
     def cache(self, start=None, end=None, *, thread=True):
         """Download and cache string chunks from Telegram."""
-        # wait for ongoing downloads
-        while True:
-            with self.isdownlock:
-                if not self.isdownloading:
-                    break
-            time.sleep(SLEEP_INTERVAL)
+        self.loaded.wait()
 
         # Если self.value ещё None (например, после set(file=...)), инициализируем список
         if self.value is None:
@@ -507,15 +623,47 @@ class LinkedString:
             for i in range(len(self.links)):
                 if self.value[i] is None:
                     self._download_chunk(i, thread)
-        elif end is None:
-            i = start // FILE_SIZE
-            if self.value[i] is None:
-                self._download_chunk(i, thread)
         else:
-            for i in range(min(len(self.links) - 1, start // FILE_SIZE), min(len(self.links), end // FILE_SIZE + 1)):
+            # start/end are character positions; chunks hold FILE_SIZE characters or,
+            # cut from a file, FILE_SIZE bytes, so they are found by their lengths
+            starts = self._char_starts()
+            first = max(0, bisect.bisect_right(starts, start) - 1)
+            last = first if end is None else bisect.bisect_right(starts, end) - 1
+            for i in range(first, min(len(self.links), last + 1)):
                 if self.value[i] is None:
                     self._download_chunk(i, thread)
 
+    def _char_starts(self):
+        """Character offset of every chunk, plus the length as the last entry.
+
+        Lengths come from local chunks or the chunk table; a chunk without
+        either is downloaded (and cached) to count it."""
+        with self.linklock:
+            if not isinstance(self.value, list):
+                if self.value:
+                    return [0, len(self.value)]
+                self.value = [None] * len(self.links)
+            value, infos = self.value, self.infos
+            counts = []
+            for i, part in enumerate(value):
+                info = infos[i] if i < len(infos) else None
+                counts.append(len(part) if part is not None else info.chars if info is not None else None)
+        for i, count in enumerate(counts):
+            if count is None:
+                self._download_chunk(i, False)
+                counts[i] = len(self.value[i])
+        return [0, *accumulate(counts)]
+
+    def _locate(self, index):
+        """(chunk index, offset in the chunk) of character `index`."""
+        starts = self._char_starts()
+        if index < 0:
+            index += starts[-1]
+        if not 0 <= index < starts[-1]:
+            raise IndexError("string index out of range")
+        i = bisect.bisect_right(starts, index) - 1
+        return i, index - starts[i]
+
     def __str__(self):
         """Convert to string by caching and joining all chunks."""
         # Если self.value ещё None (например, после set(file=...)), создаем пустой список
@@ -535,24 +683,22 @@ class LinkedString:
         """
         def task():
             with self.linklock:
-                msg = getbot_id(self.links[index]).forward(self.links[index])
-                file_id = msg.document.file_id
-                file = getbot_id(self.links[index]).bot.get_file(file_id)
-                self.value[index] = getbot_id(self.links[index]).bot.download_file(file.file_path).decode("utf-8")
+                link, info = self.links[index], self.infos[index]
+                data = check_chunk(getbot_id(link).get_document(link), info, link)
+                self.value[index] = data.decode("utf-8")
         
         if use_thread:
-            threading.Thread(target=task, daemon=True).start()
+            submit_read(task)
         else:
             task()
     
-    def wait(self):
-        """Wait for the string to be fully initialized."""
-        while self.value is None:
-            time.sleep(SLEEP_INTERVAL)
-        while self._id is None:
-            time.sleep(SLEEP_INTERVAL)
-        while len(self.links) == 0:
-            time.sleep(SLEEP_INTERVAL)
+    def wait(self, timeout=None):
+        """Wait for the string to be fully initialized.
+
+        Raises the download/upload error if there was one, or TimeoutError.
+        """
+        self.loaded.wait(timeout)
+        self.stored.wait(timeout)
     
     def get(self):
         """Get the complete string value."""
@@ -572,9 +718,19 @@ class LinkedString:
         self.wait()
         if isinstance(index, slice):
             start, stop, step = index.indices(len(self))
-            return "".join(self[i] for i in range(start, stop))
+            if start >= stop:
+                return "" if step > 0 else str(self)[index]
+            self.cache(start, stop - 1, thread=False)
+            starts = self._char_starts()
+            first = bisect.bisect_right(starts, start) - 1
+            last = bisect.bisect_right(starts, stop - 1) - 1
+            text = "".join(self.value[first:last + 1])
+            return text[start - starts[first]:stop - starts[first]:step]
         else:
-            return self.value[index // FILE_SIZE][index % FILE_SIZE]
+            chunk, offset = self._locate(index)
+            if self.value[chunk] is None:
+                self._download_chunk(chunk, False)
+            return self.value[chunk][offset]
 
     def __setitem__(self, index, value):
         """Set character(s) at the specified index or slice."""
@@ -585,52 +741,46 @@ class LinkedString:
                 # Replace exact slice
                 for idx in range(start, stop):
                     self[idx] = value[idx - start]
-                    
-                    def update_chunk(chunk_idx=idx // FILE_SIZE):
-                        with self.linklock:
-                            self.links[chunk_idx] = getbot().send_document_id(
-                                self.value[chunk_idx].encode('utf-8')
-                            )
-                    threading.Thread(target=update_chunk, daemon=True).start()
-                
-                threading.Thread(target=lambda: self.link_upload(self._id), daemon=True).start()
             else:
                 # Replace with different length - rebuild entire string
-                new = "".join(self.value[:start // FILE_SIZE])
-                new += self.value[start // FILE_SIZE][:start % FILE_SIZE]
-                new += value
-                new += self.value[stop // FILE_SIZE][stop % FILE_SIZE:]
-                new += "".join(self.value[stop // FILE_SIZE + 1:])
-                self.set(new)
+                text = str(self)
+                self.set(text[:start] + value + text[stop:])
         else:
             # Replace single character
-            self.value[index // FILE_SIZE] = (
-                self.value[index // FILE_SIZE][:index % FILE_SIZE] + 
-                value + 
-                self.value[index // FILE_SIZE][index % FILE_SIZE + 1:]
-            )
+            chunk, offset = self._locate(index)
+            if self.value[chunk] is None:
+                self._download_chunk(chunk, False)
+            self.value[chunk] = self.value[chunk][:offset] + value + self.value[chunk][offset + 1:]
             
             def update_and_upload():
                 with self.linklock:
-                    self.links[index // FILE_SIZE] = getbot().send_document_id(
-                        self.value[index // FILE_SIZE].encode('utf-8')
-                    )
-                self.link_upload(self._id)
+                    self.links[chunk], self.infos[chunk] = self._send_chunk(self.value[chunk])
+                self.link_upload()
             
-            threading.Thread(target=update_and_upload, daemon=True).start()
+            submit_write(update_and_upload)
     
     def __len__(self):
-        """Return the total length of the string."""
+        """Return the total length of the string, from the chunk table when the manifest has one."""
         self.wait()
+        with self.linklock:
+            total = totals(self.infos)
+        if total is not None and total[1] is not None:
+            return total[1]
+        self.cache(thread=False)
         return sum(map(len, self.value))
     
     def __iter__(self):
-        """Iterate over characters in the string."""
+        """Iterate over characters in the string, streaming chunks that are not cached."""
         self.wait()
-        self.cache(thread=False)
-        for chunk in self.value:
-            for char in chunk:
-                yield char
+        if isinstance(self.value, list) and None not in self.value:
+            for chunk in self.value:
+                for char in chunk:
+                    yield char
+            return
+        with self.open() as reader:
+            while text := reader.read(COPY_BUFFER):
+                for char in text:
+                    yield char
     
     def __add__(self, other):
         """Concatenate with another string."""
@@ -682,10 +832,14 @@ class SimpleString:
             value: Initial string value (optional)
             id: Existing Telegram message ID to load from (optional)
         """
-        self.uploading = queue.Queue()
+        self.lock = threading.Lock()
+        self._uploading = False
+        self._reupload = False
         self.downloading = queue.Queue()
         self.value = None
         self._id = None
+        self.loaded = Ready()   # value known
+        self.stored = Ready()   # message id known
         if file is not None or path is not None:
             if file is not None:
                 f = file
@@ -702,6 +856,7 @@ class SimpleString:
                     raise ValueError("File too large for SimpleString (use LinkedString instead).")
 
                 self.value = data
+                self.loaded.set()
                 self.upload()
             finally:
                 if close_after:
@@ -710,15 +865,16 @@ class SimpleString:
 
         if value is None:
             self.value = None
-            try:
-                self._id = Id(id)
-                self.download()
-            except:
-                self._id = None
-                self.download()
+            self._id = Id(id) if id is not None else None
+            if self._id is not None:
+                self.stored.set()
+            self.download()
         else:
             self.value = value if isinstance(value, str) else str(value)
+            self.loaded.set()
             self._id = Id(id) if id is not None else None
+            if self._id is not None:
+                self.stored.set()
             self.upload()
 
     def save(self, target):
@@ -759,6 +915,7 @@ class SimpleString:
             if len(data) > 3950:
                 raise ValueError("File too large for SimpleString (use LinkedString instead).")
             self.value = data
+            self.loaded.set()
             self.upload()
             return
         if file is not None:
@@ -768,85 +925,103 @@ class SimpleString:
             if len(data) > 3950:
                 raise ValueError("File too large for SimpleString (use LinkedString instead).")
             self.value = data
+            self.loaded.set()
             self.upload()
             return
         if value is None:
             value = ""
         self.value = str(value)
+        self.loaded.set()
         self.upload()
 
 
     def download(self):
         """Queue a download operation to fetch the string from Telegram."""
+        self.loaded.clear()
         if self.downloading.empty():
-            threading.Thread(target=self.tdownload, daemon=True).start()
+            submit_read(self.tdownload)
         else:
             self.downloading.put(1)
 
     def tdownload(self):
         """Worker thread for downloading string data from Telegram."""
-        if self._id is None:
-            return
-        
-        text = getbot_id(self._id).get_text(self._id)
-        
-        if text[:2] == SIMPLE_STRING_PREFIX:
-            self.value = text[2:-1]
-        else:
-            raise ValueError(f"Message {self._id} is not a simple string (expected prefix '{SIMPLE_STRING_PREFIX}')")
+        try:
+            if self._id is None:
+                raise ValueError("SimpleString has neither a value nor a message to load it from")
+
+            text = getbot_id(self._id).get_text(self._id)
+
+            if text[:2] == SIMPLE_STRING_PREFIX:
+                self.value = text[2:-1]
+            else:
+                raise ValueError(f"Message {self._id} is not a simple string (expected prefix '{SIMPLE_STRING_PREFIX}')")
+        except BaseException as e:
+            self.loaded.fail(e)
+            raise
+        self.loaded.set()
         
         if not self.downloading.empty():
             while not self.downloading.empty():
                 self.downloading.get()
-            threading.Thread(target=self.tdownload, daemon=True).start()
+            submit_read(self.tdownload)
 
     def upload(self):
         """Queue an upload operation to save the string to Telegram."""
-        if self.uploading.empty():
-            thread = threading.Thread(target=self.tupload, args=(self._id,), daemon=True)
-            self._id = None
-            thread.start()
-        else:
-            self.uploading.put(1)
-
-    def tupload(self, id):
+        with self.lock:
+            if self._uploading:
+                self._reupload = True
+                return
+            self._uploading = True
+        submit_write(self.tupload)
+
+    def tupload(self):
         """Worker thread for uploading string data to Telegram.
-        
-        Args:
-            id: Existing message ID to update, or None to create new
-        """
-        if isinstance(id, Id):
-            getbot_id(id).edit_message(id, SIMPLE_STRING_PREFIX + self.value + END_MARKER)
-        else:
-            bot = getbot()
-            id = Id(bot.bot_index, bot.group_index, bot.send_message(SIMPLE_STRING_PREFIX + self.value + END_MARKER))
 
-        if not self.uploading.empty():
-            while not self.uploading.empty():
-                self.uploading.get()
-            threading.Thread(target=self.tupload, args=(id,), daemon=True).start()
-        else:
-            self._id = id
+        Edits the existing message if there is one, otherwise sends a new one.
+        Values set while an upload is running are sent as one follow-up edit.
+        """
+        while True:
+            with self.lock:
+                self._reupload = False
+                id, text = self._id, SIMPLE_STRING_PREFIX + self.value + END_MARKER
+            try:
+                if isinstance(id, Id):
+                    getbot_id(id).edit_message(id, text)
+                else:
+                    id = getbot().send_message_id(text)
+            except BaseException as e:
+                with self.lock:
+                    self._uploading = False
+                if not self.stored.is_set():
+                    self.stored.fail(e)
+                raise
+            with self.lock:
+                self._id = id
+                self.stored.set()
+                if not self._reupload:
+                    self._uploading = False
+                    return
     
     @property
     def id(self):
         """Get the Telegram message ID (waits for upload if needed)."""
-        while self._id is None:
-            time.sleep(SLEEP_INTERVAL)
+        self.stored.wait()
         return self._id
     
     @id.setter
     def id(self, value):
         """Set the Telegram message ID and download the string."""
         self._id = Id(value)
+        self.stored.set()
         self.download()
     
-    def wait(self):
-        """Wait for the string to be fully initialized."""
-        while self.value is None:
-            time.sleep(SLEEP_INTERVAL)
-        while self._id is None:
-            time.sleep(SLEEP_INTERVAL)
+    def wait(self, timeout=None):
+        """Wait for the string to be fully initialized.
+
+        Raises the download/upload error if there was one, or TimeoutError.
+        """
+        self.loaded.wait(timeout)
+        self.stored.wait(timeout)
     
     def get(self):
         """Get the string value."""
@@ -860,6 +1035,15 @@ class SimpleString:
     def __str__(self):
         self.wait()
         return self.value
+
+    def __len__(self):
+        self.wait()
+        return len(self.value)
+
+    def open(self, read_ahead=READ_AHEAD, memory=MEMORY_BUDGET):
+        """Text reader over the value (it is a single message, so nothing streams)."""
+        self.wait()
+        return io.StringIO(self.value)
     
     def __inter__(self):
         self.wait()
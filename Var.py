@@ -6,54 +6,82 @@ from .Bytes import Bytes
 from .id_class import Id
 from .Undefined import UndefinedVar
 from .config import getbot_id
+from .executor import submit_read
 import threading
 
 _UNSET = object()  # внутренний маркер для "аргумент не передан"
 
 
+def _persist(obj):
+    # результаты арифметики Int не сохраняются, пока их не положат в Var
+    if isinstance(obj, Int):
+        obj.persist()
+    return obj
+
+
 class Var:
     def __init__(self, value=_UNSET, id=None):
         self.lock = threading.RLock()
         self._obj = None
         evt = threading.Event()
-        def th(self=self, value=value, id=id):
-            with self.lock:
-                evt.set()
-                if id is not None:
-                    id = Id(id)
-
-                    if value is _UNSET:
-                        text = getbot_id(id).get_text(id) or ""
-                        text = text.strip()
-
-                        if text.startswith("i"):
-                            self._obj = Int(id=id)
-                        elif text.startswith("s"):
-                            self._obj = Str(id=id)
-                        elif text.startswith("L"):
-                            self._obj = List(id=id)
-                        elif text.startswith("b"):
-                            self._obj = Bytes(id=id)
-                        elif text.startswith("n"):
-                            self._obj = Null(id=id)
-                        else:
-                            self._obj = UndefinedVar(id=id)
-                        return
+        def load(value, id):
+            if id is not None:
+                id = Id(id)
 
+                if value is _UNSET:
+                    text = getbot_id(id).get_text(id) or ""
+                    text = text.strip()
+
+                    if text.startswith("i"):
+                        self._obj = Int(id=id)
+                    elif text.startswith("s"):
+                        self._obj = Str(id=id)
+                    elif text.startswith("L"):
+                        self._obj = List(id=id)
+                    elif text.startswith("b"):
+                        self._obj = Bytes(id=id)
+                    elif text.startswith("n"):
+                        self._obj = Null(id=id)
                     else:
-                        wrapped = self._wrap_value(value, id)
-                        wrapped._id = id
-                        self._obj = wrapped
-                        return
+                        self._obj = UndefinedVar(id=id)
+                    return
 
-                if value is _UNSET:
-                    self._obj = Null()
                 else:
-                    self._obj = self._wrap_value(value)
-        threading.Thread(target=th).start()
+                    wrapped = self._wrap_value(value, id)
+                    wrapped._id = id
+                    self._obj = _persist(wrapped)
+                    return
+
+            if value is _UNSET:
+                self._obj = Null()
+            else:
+                self._obj = _persist(self._wrap_value(value))
+        def th(self=self, value=value, id=id):
+            with self.lock:
+                evt.set()
+                try:
+                    load(value, id)
+                except BaseException as e:
+                    # ошибку загрузки отдаём тому, кто обратится к значению
+                    self.__dict__["_error"] = e
+                    raise
+        submit_read(th)
         evt.wait()
 
-    def _wrap_value(self, value, id):
+    @property
+    def _obj(self):
+        # the loader thread holds the lock until the wrapped object is in place
+        with self.lock:
+            if self.__dict__.get("_error") is not None:
+                raise self.__dict__["_error"]
+            return self.__dict__["_value"]
+
+    @_obj.setter
+    def _obj(self, value):
+        self.__dict__["_error"] = None
+        self.__dict__["_value"] = value
+
+    def _wrap_value(self, value, id=None):
         if isinstance(value, (Str, Int, List, Null, Bytes)):
             return value
         elif isinstance(value, bytes):
@@ -84,7 +112,7 @@ class Var:
         return getattr(self._obj, name)
 
     def __setattr__(self, name, value):
-        if name == "_obj":
+        if name in ("_obj", "lock"):
             super().__setattr__(name, value)
         else:
             setattr(self._obj, name, value)
@@ -1,5 +1,5 @@
-from .id_class import Id
-from .config import config, getbot_id
+from .id_class import Id, PendingId
+from .config import config, getbot_id, stats, reset_stats, flush, flush_all
 from .Int import Int
 from .String import Str, SimpleString, LinkedString
 from .Null import Null
@@ -7,3 +7,4 @@ from .Var import Var
 from .List import List
 from .Bytes import SimpleBytes, LinkedBytes, Bytes
 from .chain import Chain
+from .backend import FakeTelegram
@@ -0,0 +1,189 @@
+import itertools
+import threading
+import random
+import time
+from collections import Counter
+
+try:
+    import telebot
+    ApiTelegramException = telebot.apihelper.ApiTelegramException
+except ImportError:
+    telebot = None
+
+    class ApiTelegramException(Exception):
+        """Stand-in for telebot.apihelper.ApiTelegramException when telebot is not installed."""
+
+        def __init__(self, function_name, result, result_json):
+            super().__init__(f"A request to the Telegram API was unsuccessful. Error code: {result_json['error_code']}. Description: {result_json['description']}")
+            self.function_name = function_name
+            self.result = result
+            self.result_json = result_json
+            self.error_code = result_json['error_code']
+            self.description = result_json['description']
+
+def telegram(token):
+    """Default backend: a real telebot.TeleBot."""
+    if telebot is None:
+        raise ImportError("pyTelegramBotAPI is required for the Telegram backend")
+    return telebot.TeleBot(token)
+
+def api_error(method, code, description, **parameters):
+    result_json = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        result_json["parameters"] = parameters
+    return ApiTelegramException(method, None, result_json)
+
+
+class Document:
+    def __init__(self, file_id, file_size):
+        self.file_id, self.file_size = file_id, file_size
+
+class File:
+    def __init__(self, file_id, file_path, file_size):
+        self.file_id, self.file_path, self.file_size = file_id, file_path, file_size
+
+class Message:
+    def __init__(self, id, chat_id, text=None, document=None):
+        self.id = self.message_id = id
+        self.chat_id = chat_id
+        self.text, self.document = text, document
+
+
+class FakeTelegram:
+    """In-process stand-in for the Telegram Bot API, shared by every token.
+
+    Pass an instance as config({"backend": fake}); calling it with a token gives
+    a bot object with the subset of the telebot.TeleBot API the package uses.
+
+    latency      seconds added to every call, or a (min, max) range
+    chat_rate    (calls per second, burst) allowed per token and chat, None for unlimited
+    text_limit   longest accepted message text
+    file_limit   largest document accepted by send_document
+    download_limit  largest file get_file agrees to serve
+    failure_rate probability of a call failing with a 500 error
+    fail         callable(method, args) returning an exception to raise, or None
+    """
+
+    def __init__(self, *, latency=0, chat_rate=None, text_limit=4096, file_limit=50 * 2**20,
+                 download_limit=20 * 2**20, failure_rate=0, fail=None, seed=None):
+        self.latency, self.chat_rate = latency, chat_rate
+        self.text_limit, self.file_limit, self.download_limit = text_limit, file_limit, download_limit
+        self.failure_rate, self.fail = failure_rate, fail
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.messages = {}  # (chat_id, message_id) -> Message
+        self.files = {}  # file_id -> bytes
+        self.allowance = {}  # (token, chat_id) -> [tokens, stamp]
+        self.calls = Counter()
+        self.bytes_sent = self.bytes_received = 0
+
+    def __call__(self, token):
+        return FakeBot(self, token)
+
+    def reset_stats(self):
+        with self.lock:
+            self.calls.clear()
+            self.bytes_sent = self.bytes_received = 0
+
+    def request(self, token, method, chat_id=None, args=()):
+        with self.lock:
+            self.calls[method] += 1
+        if isinstance(self.latency, (tuple, list)):
+            time.sleep(self.random.uniform(*self.latency))
+        elif self.latency:
+            time.sleep(self.latency)
+        if self.fail is not None:
+            error = self.fail(method, args)
+            if error is not None:
+                raise error
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            raise api_error(method, 500, "Internal Server Error: injected failure")
+        if self.chat_rate is not None and chat_id is not None:
+            self._take(token, method, chat_id)
+
+    def _take(self, token, method, chat_id):
+        rate, burst = self.chat_rate
+        with self.lock:
+            now = time.monotonic()
+            tokens, stamp = self.allowance.get((token, chat_id), (burst, now))
+            tokens = min(burst, tokens + (now - stamp) * rate)
+            if tokens < 1:
+                self.allowance[(token, chat_id)] = (tokens, now)
+                raise api_error(method, 429, "Too Many Requests: retry after", retry_after=(1 - tokens) / rate)
+            self.allowance[(token, chat_id)] = (tokens - 1, now)
+
+    def traffic(self, sent=0, received=0):
+        with self.lock:
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+    def post(self, chat_id, text=None, document=None):
+        with self.lock:
+            message = Message(next(self.ids), chat_id, text, document)
+            self.messages[(chat_id, message.id)] = message
+            return message
+
+    def message(self, method, chat_id, message_id):
+        with self.lock:
+            if (chat_id, message_id) not in self.messages:
+                raise api_error(method, 400, "Bad Request: message to forward not found")
+            return self.messages[(chat_id, message_id)]
+
+
+class FakeBot:
+    def __init__(self, server, token):
+        self.server, self.token = server, token
+
+    def send_message(self, chat_id, text, parse_mode=None, timeout=None, **kwargs):
+        self.server.request(self.token, "send_message", chat_id, (text, ))
+        if not text:
+            raise api_error("send_message", 400, "Bad Request: message text is empty")
+        if len(text) > self.server.text_limit:
+            raise api_error("send_message", 400, "Bad Request: message is too long")
+        self.server.traffic(sent=len(text))
+        return self.server.post(chat_id, text)
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, parse_mode=None, timeout=None, **kwargs):
+        self.server.request(self.token, "edit_message_text", chat_id, (text, ))
+        if len(text) > self.server.text_limit:
+            raise api_error("edit_message_text", 400, "Bad Request: MESSAGE_TOO_LONG")
+        message = self.server.message("edit_message_text", chat_id, message_id)
+        if message.text == text:
+            raise api_error("edit_message_text", 400, "Bad Request: message is not modified: specified new message content and reply markup are exactly the same as a current content and reply markup of the message")
+        message.text = text
+        self.server.traffic(sent=len(text))
+        return message
+
+    def forward_message(self, chat_id, from_chat_id, message_id, timeout=None, **kwargs):
+        self.server.request(self.token, "forward_message", chat_id, (from_chat_id, message_id))
+        message = self.server.message("forward_message", from_chat_id, message_id)
+        if message.text is not None:
+            self.server.traffic(received=len(message.text))
+        return self.server.post(chat_id, message.text, message.document)
+
+    def send_document(self, chat_id, document, timeout=None, **kwargs):
+        self.server.request(self.token, "send_document", chat_id, (document, ))
+        data = document.read() if hasattr(document, "read") else bytes(document)
+        if len(data) > self.server.file_limit:
+            raise api_error("send_document", 413, "Request Entity Too Large")
+        with self.server.lock:
+            file_id = f"FAKE{len(self.server.files)}x{self.server.random.getrandbits(32):08x}"
+            self.server.files[file_id] = data
+        self.server.traffic(sent=len(data))
+        return self.server.post(chat_id, document=Document(file_id, len(data)))
+
+    def get_file(self, file_id):
+        self.server.request(self.token, "get_file", None, (file_id, ))
+        if file_id not in self.server.files:
+            raise api_error("get_file", 400, "Bad Request: invalid file_id")
+        size = len(self.server.files[file_id])
+        if size > self.server.download_limit:
+            raise api_error("get_file", 400, "Bad Request: file is too big")
+        return File(file_id, "documents/" + file_id, size)
+
+    def download_file(self, file_path):
+        self.server.request(self.token, "download_file", None, (file_path, ))
+        data = self.server.files[file_path.split("/")[-1]]
+        self.server.traffic(received=len(data))
+        return data
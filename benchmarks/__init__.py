@@ -0,0 +1,7 @@
+"""Benchmarks for every storage type, run against backend.FakeTelegram.
+
+    python -m <package>.benchmarks [case ...] [--full] [--latency 0.02] [-o report.json]
+
+Each case runs in its own interpreter and reports wall time, API calls per
+method, traffic and peak RSS as JSON, so reports from two releases can be
+diffed to spot regressions."""
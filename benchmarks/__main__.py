@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from .cases import CASES
+
+def run_case(name, args):
+    """Runs one case in this process and returns its JSON-able report."""
+    from ..config import config
+    from ..backend import FakeTelegram
+    fake = FakeTelegram(latency=args.latency, seed=args.seed)
+    config({
+        "backend": fake,
+        "tokens": [f"bench{i}" for i in range(args.bots)],
+        "groups": [-100 - i for i in range(args.groups)],
+        "trashgroup": -1,
+        "bot_rate": (args.rate, args.rate),
+        "chat_rate": (args.rate, args.rate),
+    })
+    func, quick, full = CASES[name]
+    params = full if args.full else quick
+    phases = {}
+    start = time.perf_counter()
+    extra = func(fake, phases, **params)
+    return {
+        "name": name,
+        "params": params,
+        "wall_seconds": time.perf_counter() - start,
+        "phases": phases,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        **extra,
+    }
+
+def run_child(name, args):
+    """Runs one case in a fresh interpreter so its peak RSS is its own."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    command = [sys.executable, "-m", __package__, name, "--child",
+               "--latency", str(args.latency), "--rate", str(args.rate), "--bots", str(args.bots),
+               "--groups", str(args.groups), "--seed", str(args.seed)] + (["--full"] if args.full else [])
+    out = subprocess.run(command, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"name": name, "error": (out.stderr.strip().splitlines() or ["exit code %d" % out.returncode])[-1]}
+    return json.loads(out.stdout.strip().splitlines()[-1])[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m " + __package__, description="Benchmarks every storage type against backend.FakeTelegram.")
+    parser.add_argument("cases", nargs="*", help=f"cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument("--full", action="store_true", help="use release-sized parameters (up to 1 GiB of payload)")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every fake API call")
+    parser.add_argument("--rate", type=float, default=1000, help="client-side calls per second per token and per chat")
+    parser.add_argument("--bots", type=int, default=2)
+    parser.add_argument("--groups", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--in-process", action="store_true", help="do not start a subprocess per case (peak RSS becomes cumulative)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    names = args.cases or list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    if args.child:
+        print(json.dumps([run_case(name, args) for name in names]))
+        return
+    if args.in_process:
+        results = [run_case(name, args) for name in names]
+    else:
+        results = [run_child(name, args) for name in names]
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "full": args.full,
+        "latency": args.latency,
+        "bots": args.bots,
+        "groups": args.groups,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import io
+import os
+import random
+import string
+import time
+
+from .. import executor
+from ..config import cache
+from ..Int import Int
+from ..List import List
+from ..Var import Var
+from ..chain import Chain
+from ..Bytes import SimpleBytes, LinkedBytes
+from ..String import LinkedString
+
+class Phase:
+    """Times one measured section and snapshots the fake backend's counters for it.
+
+    Background uploads started before the section are drained on entry, the ones
+    started inside it are drained before the clock stops."""
+
+    def __init__(self, fake, results, name):
+        self.fake, self.results, self.name = fake, results, name
+
+    def __enter__(self):
+        executor.wait_all()
+        self.fake.reset_stats()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        executor.wait_all()
+        seconds = time.perf_counter() - self.start
+        self.results[self.name] = {
+            "seconds": seconds,
+            "api_calls": dict(self.fake.calls),
+            "api_calls_total": sum(self.fake.calls.values()),
+            "bytes_sent": self.fake.bytes_sent,
+            "bytes_received": self.fake.bytes_received,
+        }
+
+def cold():
+    """Forgets every cached message so the next reads hit the backend."""
+    executor.wait_all()
+    cache.clear()
+
+def text(size):
+    return "".join(random.choices(string.ascii_letters + string.digits, k=size))
+
+
+def int_iadd(fake, results, n):
+    i = Int(0)
+    with Phase(fake, results, "iadd"):
+        for _ in range(n):
+            i += 1
+    cold()
+    return {"ops": n, "ok": int(Int(id=i.id)) == n}
+
+def list_append(fake, results, n):
+    lst = List()
+    with Phase(fake, results, "append"):
+        for k in range(n):
+            lst.append(k)
+    return {"ops": n, "ok": len(lst) == n}
+
+def simplebytes_roundtrip(fake, results, size):
+    data = os.urandom(size)
+    with Phase(fake, results, "write"):
+        b = SimpleBytes(data)
+    idd = b.id
+    cold()
+    with Phase(fake, results, "read"):
+        out = SimpleBytes(id=idd).get()
+    return {"bytes": size, "ok": out == data}
+
+def chain_roundtrip(fake, results, size):
+    data = text(size)
+    with Phase(fake, results, "write"):
+        c = Chain(data)
+    idd = c.id
+    cold()
+    with Phase(fake, results, "read"):
+        out = Chain(id=idd).get()
+    return {"chars": size, "ok": out == data}
+
+def linkedbytes_set_save(fake, results, size):
+    data = random.randbytes(size)
+    with Phase(fake, results, "set"):
+        lb = LinkedBytes(data)
+        lb.headers_lock.wait()
+    idd = lb.id
+    del lb
+    cold()
+    out = io.BytesIO()
+    with Phase(fake, results, "save"):
+        reader = LinkedBytes(id=idd)
+        reader.headers_lock.wait()
+        reader.save(out)
+    ok = out.getbuffer().nbytes == size and out.getvalue() == data
+    return {"bytes": size, "ok": ok}
+
+def linkedstring_getitem(fake, results, size, reads):
+    data = text(size)
+    s = LinkedString(data)
+    s.wait()
+    idd = s.id
+    cold()
+    indexes = [random.randrange(size) for _ in range(reads)]
+    with Phase(fake, results, "getitem"):
+        reader = LinkedString(id=idd)
+        out = [reader[k] for k in indexes]
+    return {"ops": reads, "ok": out == [data[k] for k in indexes]}
+
+def var_cold_open(fake, results, n):
+    ints = [Int(k) for k in range(n)]
+    ids = [i.id for i in ints]
+    cold()
+    with Phase(fake, results, "open"):
+        values = [int(Var(id=idd)) for idd in ids]
+    return {"ops": n, "ok": values == list(range(n))}
+
+# name -> (function, quick parameters, full parameters)
+CASES = {
+    "int_iadd": (int_iadd, {"n": 200}, {"n": 2000}),
+    "list_append_1k": (list_append, {"n": 1000}, {"n": 1000}),
+    "list_append_10k": (list_append, {"n": 2000}, {"n": 10000}),
+    "simplebytes_4k": (simplebytes_roundtrip, {"size": 4096}, {"size": 4096}),
+    "simplebytes_12k": (simplebytes_roundtrip, {"size": 11850}, {"size": 11850}),
+    "chain_4k": (chain_roundtrip, {"size": 4096}, {"size": 4096}),
+    "chain_12k": (chain_roundtrip, {"size": 12288}, {"size": 12288}),
+    "linkedbytes_100m": (linkedbytes_set_save, {"size": 20 * 2**20}, {"size": 100 * 2**20}),
+    "linkedbytes_1g": (linkedbytes_set_save, {"size": 40 * 2**20}, {"size": 2**30}),
+    "linkedstring_getitem": (linkedstring_getitem, {"size": 2 * 10**6, "reads": 100}, {"size": 40 * 10**6, "reads": 1000}),
+    "var_cold_open": (var_cold_open, {"n": 200}, {"n": 2000}),
+}
@@ -4,4 +4,108 @@ def to_str(data_bytes):
     return base64.b64encode(data_bytes).decode('ascii')
 
 def to_bytes(encoded_str):
-    return base64.b64decode(encoded_str)
\ No newline at end of file
+    return base64.b64decode(encoded_str)
+
+
+class Codec:
+    """Text form of bytes for message bodies. `tag` is the one letter written into
+    the prefix of whatever stores the text, so readers know how to decode it."""
+
+    def __init__(self, tag, name, encode, decode):
+        self.tag, self.name = tag, name
+        self.encode, self.decode = encode, decode
+
+    def __repr__(self):
+        return f"Codec({self.name})"
+
+codecs = {}
+
+def register_codec(codec):
+    if(len(codec.tag) != 1 or not codec.tag.isalpha()):
+        raise ValueError("codec tag must be a single letter")
+    codecs[codec.tag] = codecs[codec.name] = codec
+    return codec
+
+def get_codec(codec=None) -> Codec:
+    """Codec by tag, by name or itself; None is the default codec."""
+    if(codec is None):
+        return default_codec
+    if(isinstance(codec, Codec)):
+        return codec
+    return codecs[codec]
+
+def set_default_codec(codec):
+    global default_codec
+    default_codec = get_codec(codec)
+
+
+# base32768: 15 bits per character, every character a CJK ideograph or Hangul
+# syllable of the BMP (one UTF-16 unit, never stripped). All of them are
+# unchanged by NFC/NFKC, but Hangul syllables decompose under NFD/NFKD: the
+# encoding relies on Telegram not normalizing message text to a decomposed
+# form. A final group of 7 bits or less is written with one of 128 Yi
+# syllables instead.
+# Padding bits are ones and always shorter than a byte, so decoding just drops
+# them. Telegram counts UTF-16 units, so a message holds 15/6 = 2.5 times the
+# bytes it holds in base64.
+def _alphabet(ranges, size):
+    out = []
+    for start, end in ranges:
+        out.extend(map(chr, range(start, end + 1)))
+    return out[:size]
+
+_B32K = _alphabet([(0x4E00, 0x9FA5), (0xAC00, 0xD7A3), (0x3400, 0x4DB5)], 1 << 15)
+_B32K_TAIL = _alphabet([(0xA000, 0xA07F)], 1 << 7)
+_B32K_VALUE = {c: i for i, c in enumerate(_B32K)}
+_B32K_TAIL_VALUE = {c: i for i, c in enumerate(_B32K_TAIL)}
+
+def b32k_encode(data):
+    data = memoryview(data).cast("B")
+    alphabet = _B32K
+    full = len(data) - len(data) % 15
+    out = []
+    for i in range(0, full, 15):
+        x = int.from_bytes(data[i:i + 15], "big")
+        out += (alphabet[x >> 105], alphabet[x >> 90 & 0x7fff], alphabet[x >> 75 & 0x7fff], alphabet[x >> 60 & 0x7fff],
+                alphabet[x >> 45 & 0x7fff], alphabet[x >> 30 & 0x7fff], alphabet[x >> 15 & 0x7fff], alphabet[x & 0x7fff])
+    bits = 8 * (len(data) - full)
+    if(bits):
+        x = int.from_bytes(data[full:], "big")
+        while bits >= 15:
+            bits -= 15
+            out.append(alphabet[x >> bits & 0x7fff])
+        if(bits > 7):
+            out.append(alphabet[(x & (1 << bits) - 1) << 15 - bits | (1 << 15 - bits) - 1])
+        elif(bits):
+            out.append(_B32K_TAIL[(x & (1 << bits) - 1) << 7 - bits | (1 << 7 - bits) - 1])
+    return "".join(out)
+
+def b32k_decode(text):
+    value = _B32K_VALUE
+    full = len(text) - len(text) % 8
+    if(full and full == len(text) and text[-1] in _B32K_TAIL_VALUE):
+        full -= 8
+    out = bytearray()
+    try:
+        for i in range(0, full, 8):
+            a, b, c, d, e, f, g, h = map(value.__getitem__, text[i:i + 8])
+            x = a << 105 | b << 90 | c << 75 | d << 60 | e << 45 | f << 30 | g << 15 | h
+            out += x.to_bytes(15, "big")
+        x = bits = 0
+        for k in range(full, len(text)):
+            char = text[k]
+            if(char in value):
+                x, bits = x << 15 | value[char], bits + 15
+            elif(k == len(text) - 1):
+                x, bits = x << 7 | _B32K_TAIL_VALUE[char], bits + 7
+            else:
+                raise KeyError(char)
+    except KeyError as e:
+        raise ValueError(f"invalid base32768 character {e.args[0]!r}") from None
+    x >>= bits % 8
+    out += x.to_bytes(bits // 8, "big")
+    return bytes(out)
+
+BASE64 = register_codec(Codec("b", "base64", to_str, to_bytes))
+BASE32768 = register_codec(Codec("k", "base32768", b32k_encode, b32k_decode))
+default_codec = BASE32768
@@ -0,0 +1,166 @@
+import threading
+import sqlite3
+import time
+import sys
+import os
+from collections import OrderedDict
+
+MISSING = object()
+
+def sizeof(value):
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """Thread-safe LRU cache bounded both by entry count and by total size of the values."""
+
+    def __init__(self, max_entries=1000, max_bytes=16 * 2**20):
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self.data = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return default
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        size = sizeof(value)
+        with self.lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                return
+            self.data[key] = value
+            self.size += size
+            self._shrink()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self._pop(key, default)
+
+    def _pop(self, key, default=None):
+        if key not in self.data:
+            return default
+        value = self.data.pop(key)
+        self.size -= sizeof(value)
+        return value
+
+    def _shrink(self):
+        while self.data and (len(self.data) > self.max_entries or self.size > self.max_bytes):
+            _, value = self.data.popitem(last=False)
+            self.size -= sizeof(value)
+            self.evictions += 1
+
+    def resize(self, max_entries=None, max_bytes=None):
+        with self.lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._shrink()
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.data), "bytes": self.size, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = self.misses = self.evictions = 0
+
+
+class DiskCache:
+    """Persistent LRU tier in a sqlite file under `directory`, bounded by total size of the values."""
+
+    def __init__(self, directory, max_bytes=2**30):
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.db = sqlite3.connect(os.path.join(directory, "cache.sqlite3"), check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, size INTEGER, used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+        self.size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key, default=None):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM entries WHERE key = ?", (key, )).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self.db.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def __setitem__(self, key, value):
+        size = sizeof(value)
+        with self.lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                return
+            self.db.execute("INSERT INTO entries VALUES (?, ?, ?, ?)", (key, value, size, time.time()))
+            self.size += size
+            self._shrink()
+
+    def pop(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def _pop(self, key):
+        row = self.db.execute("SELECT size FROM entries WHERE key = ?", (key, )).fetchone()
+        if row is not None:
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key, ))
+            self.size -= row[0]
+
+    def _shrink(self):
+        while self.size > self.max_bytes:
+            key, size = self.db.execute("SELECT key, size FROM entries ORDER BY used LIMIT 1").fetchone()
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key, ))
+            self.size -= size
+            self.evictions += 1
+
+    def resize(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._shrink()
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM entries")
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {"entries": entries, "bytes": self.size, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = self.misses = self.evictions = 0
@@ -1,103 +1,150 @@
-from .id_class import Id
-from .config import getbot, getbot_id
+from .id_class import Id, PendingId, PACKED_PREFIX, pack_ids, parse_ids
+from .config import getbot, getbot_id, get_texts
+from .executor import submit_read, submit_write, result_of, Ready
+from .bytes_string import codecs
 import threading
 
 MANIFEST_PAGE_LIMIT = 4000
+MESSAGE_LIMIT = 4096
 
 class Chain:
-    def __init__(self, string=None, id=None, *, separator="$", init=""):
+    """Text stored over several messages.
+
+    The head message is `init` + codec tag + packed ids of the other pages + "\\n"
+    + separator + last part; every other page is separator + one part of
+    MANIFEST_PAGE_LIMIT characters, in order. A chain that fits one message is
+    just init + tag + separator + text. Chains written before the index existed
+    link each page to the previous one with `prev_id$content` and are walked."""
+
+    def __init__(self, string=None, id=None, *, separator="$", init="", codec=None):
         self.init = init
+        # tag of the codec the text was produced with, written right after `init`
+        self.codec = codec
         self.separator = separator
         self.lock = threading.RLock()
+        # page ids, head first, and the text each of them holds (None when unknown)
         self.headers = []
+        self.written = []
         self.value = ""
-        self._id = Id().lock()
+        self.loaded = Ready()
+        self._id = PendingId()
         if id is None:
             if string is None:
                 string = ""
             self.set(string)
         else:
-            self._id = id
-            threading.Thread(target=self.download).start()
-
-    def _id_generator(self, headers_snapshot):
-        for hdr in headers_snapshot:
-            def make_editer(h=hdr):
-                def edit_fn(value):
-                    res = getbot_id(h).edit_message(h, value)
-                    return res
-                return edit_fn
-            yield make_editer()
-        while True:
-            def sender(value):
-                return getbot().send_message_id(value)
-            yield sender
-
-    def _normalize_returned_id(self, raw):
-        if isinstance(raw, Id):
-            return raw
-        if isinstance(raw, str):
-            return Id().from_str(raw)
-        try:
-            return Id().from_str(str(raw))
-        except Exception:
-            return Id().from_str(str(raw))
+            self._id = Id(id)
+            self.loaded.clear()
+            submit_read(self.download)
+
+    def _split(self, string):
+        parts = [string[i:i + MANIFEST_PAGE_LIMIT] for i in range(0, len(string), MANIFEST_PAGE_LIMIT)]
+        last = parts.pop() if parts else ""
+        # generous bound of the index length: a packed id never takes 10 characters
+        head = len(self.init) + len(self.codec or "") + 1 + len(self.separator) + 16 + 10 * len(parts)
+        if(head + len(last) > MESSAGE_LIMIT):
+            parts.append(last)
+            last = ""
+        return parts, last
 
     def set(self, string):
+        self.value = string
+        self.loaded.set()
         def th(self=self, string=string):
-            with self.lock:
-                self.value = string
-                parts = []
-                s = string
-                while len(s) > MANIFEST_PAGE_LIMIT:
-                    parts.append(s[:MANIFEST_PAGE_LIMIT])
-                    s = s[MANIFEST_PAGE_LIMIT:]
-                parts.append(s)
-
-                headers_snapshot = list(self.headers)
-                gen = self._id_generator(headers_snapshot)
-                new_headers = []
-                last_id = None
-
-                num = 0
-                for part in parts:
-                    num += 1
-                    last_id_str = (str(last_id) if last_id != None else "")
-                    content = f"{self.init if num == len(parts) else ""}{last_id_str}{self.separator}{part}"
-                    last_raw = next(gen)(content)
-                    last_id = self._normalize_returned_id(last_raw)
-                    new_headers.append(last_id)
-
-                self._id = last_id
-                self.headers = new_headers[::-1]
-        threading.Thread(target=th).start()
+            try:
+                self._write(string)
+            except BaseException as e:
+                if(not self._id.done()):
+                    self._id.fail(e)
+                raise
+        submit_write(th)
+
+    def _write(self, string):
+        with self.lock:
+            self.value = string
+            parts, last = self._split(string)
+
+            # pages whose text did not change are left alone, the others go out in parallel
+            old, old_written = self.headers[1:], self.written[1:]
+            pages, written, edits = [], [], []
+            for i, part in enumerate(parts):
+                content = self.separator + part
+                if(i < len(old)):
+                    if(old_written[i] != content):
+                        edits.append(submit_write(getbot_id(old[i]).edit_message, old[i], content))
+                    pages.append(old[i])
+                else:
+                    pages.append(submit_write(lambda content: getbot().send_message_id(content), content))
+                written.append(content)
+            pages = [p if isinstance(p, Id) else result_of(p) for p in pages]
+            for edit in edits:
+                result_of(edit)
+
+            index = pack_ids(pages) + "\n" if pages else ""
+            head_text = self.init + (self.codec or "") + index + self.separator + last
+            if(self.headers):
+                head = self.headers[0]
+                if(self.written[0] != head_text):
+                    getbot_id(head).edit_message(head, head_text)
+            else:
+                head = getbot().send_message_id(head_text)
+
+            if(not self._id.done()):
+                self._id.set(head)
+            self._id = head
+            self.headers = [head] + pages
+            self.written = [head_text] + written
 
     def download(self):
+        try:
+            self._download()
+        except BaseException as e:
+            self.loaded.fail(e)
+            raise
+
+    def _download(self):
         with self.lock:
-            full = []
-            current = self._id
-            self.headers = [current]
-
-            init = True
-            while True:
-                text = getbot_id(current).get_text(current)
-                if(init):
-                    text = text[len(self.init):]
-                    init = False
-                sep = text.find(self.separator)
-                if sep <= 0:
-                    full.append(text.lstrip(self.separator))
-                    break
-                prev_raw = text[:sep]
-                content = text[sep + 1:]
-                full.append(content)
-                prev_id = Id().from_str(prev_raw)
-                self.headers.append(prev_id)
-                current = prev_id
-
-            self.value = "".join(reversed(full))
+            head = self._id
+            head_text = getbot_id(head).get_text(head)
+            text = head_text[len(self.init):]
+            # ids, indexes and the separator never start with a letter, so a letter here is a codec tag
+            if(text[:1] in codecs):
+                self.codec, text = text[0], text[1:]
+            else:
+                self.codec = None
+
+            if(text.startswith(PACKED_PREFIX)):
+                index, _, last = text.partition("\n")
+                pages = parse_ids(index)
+                texts = get_texts(pages)
+                full = [t[len(self.separator):] for t in texts]
+                full.append(last[len(self.separator):])
+                self.headers = [head] + pages
+                self.written = [head_text] + texts
+            else:
+                full, self.headers = self._walk(head, text)
+                self.written = [None] * len(self.headers)
+
+            self.value = "".join(full)
+            self.loaded.set()
+
+    def _walk(self, current, text):
+        """Parts and page ids of a chain in the old linked layout, starting at its head."""
+        full = []
+        headers = [current]
+        while True:
+            sep = text.find(self.separator)
+            if sep <= 0:
+                full.append(text.lstrip(self.separator))
+                break
+            full.append(text[sep + 1:])
+            current = Id.from_str(text[:sep])
+            headers.append(current)
+            text = getbot_id(current).get_text(current)
+        return full[::-1], headers
 
     def __str__(self):
+        self.loaded.wait()
         with self.lock:
             return self.value
 
@@ -107,4 +154,4 @@ class Chain:
     @property
     def id(self):
         with self.lock:
-            return self._id
\ No newline at end of file
+            return self._id
@@ -1,7 +1,12 @@
-import telebot
-import time
-from .id_class import Id
+import threading
+import atexit
 import time
+from .id_class import Id, PACKED_PREFIX, pack_ids, split_ids, unpack_ids
+from .cache import LRUCache, DiskCache, MISSING
+from . import executor
+from .backend import ApiTelegramException, telegram
+from .metrics import Registry, payload_size
+from .bytes_string import set_default_codec
 
 trashgroup = 0
 tokens = []
@@ -9,102 +14,464 @@ groups = []
 bots = []
 matrix = []
 pointer = 0
-cache_limit = 5
+reader_pointer = 0
+backend = telegram  # token -> bot client; see backend.FakeTelegram for an offline one
+cache_limit = 1000
+cache_bytes = 16 * 2**20
+disk = None  # optional persistent DiskCache, enabled with the "disk_cache" directory
+disk_cache_bytes = 2**30
+
+# Telegram limits: ~30 messages per second per token, 20 messages per minute
+# per chat. Each value is (rate in calls per second, burst size).
+bot_rate = (30, 30)
+chat_rate = (20 / 60, 20)
+retries = 5
+edit_window = 0  # seconds to hold back edits of one message and send only the latest text
+write_ahead = None  # chunks a writer keeps uploading at once; None: one per bot/group pair
 
 def config(conf):
     global trashgroup
     global tokens
     global groups
     global cache_limit
+    global cache_bytes
+    global disk
+    global disk_cache_bytes
+    global bot_rate
+    global chat_rate
+    global retries
+    global backend
+    global edit_window
+    global write_ahead
     if("trashgroup" in conf):
         trashgroup = conf["trashgroup"]
     if("groups" in conf):
         groups = conf["groups"]
+    if("backend" in conf):
+        backend = conf["backend"] or telegram
     if("tokens" in conf):
         tokens = conf["tokens"]
+    if("tokens" in conf or "backend" in conf or "groups" in conf):
         rebots()
     if("cache_size" in conf):
         cache_limit = conf["cache_size"]
+        cache.resize(max_entries=cache_limit)
+    if("cache_bytes" in conf):
+        cache_bytes = conf["cache_bytes"]
+        cache.resize(max_bytes=cache_bytes)
+    if("disk_cache_bytes" in conf):
+        disk_cache_bytes = conf["disk_cache_bytes"]
+        if(disk is not None):
+            disk.resize(disk_cache_bytes)
+    if("disk_cache" in conf):
+        disk = DiskCache(conf["disk_cache"], disk_cache_bytes) if conf["disk_cache"] else None
+    if("bot_rate" in conf):
+        bot_rate = tuple(conf["bot_rate"])
+        buckets.clear()
+    if("chat_rate" in conf):
+        chat_rate = tuple(conf["chat_rate"])
+        buckets.clear()
+    if("retries" in conf):
+        retries = conf["retries"]
+    if("edit_window" in conf):
+        edit_window = conf["edit_window"]
+        if(not edit_window):
+            flush_all()
+    if("codec" in conf):
+        set_default_codec(conf["codec"])
+    if("write_ahead" in conf):
+        write_ahead = conf["write_ahead"]
+        executor.writers.resize(workers=max(executor.writers.workers, upload_window()))
+    if("read_workers" in conf):
+        executor.readers.resize(workers=conf["read_workers"])
+    if("write_workers" in conf):
+        executor.writers.resize(workers=conf["write_workers"])
+    if("queue_size" in conf):
+        executor.readers.resize(queue_size=conf["queue_size"])
+        executor.writers.resize(queue_size=conf["queue_size"])
+    if("report_errors" in conf):
+        executor.readers.report_errors = executor.writers.report_errors = bool(conf["report_errors"])
 
 def rebots():
     global bots
     global pointer
+    global reader_pointer
     global matrix
-    pointer = 0
+    pointer = reader_pointer = 0
+    matrix = []
     for tok in tokens:
-        bot = telebot.TeleBot(tok)
+        bot = backend(tok)
         botlist = []
         for group in groups:
             vbot = Bot(bot, group, tok)
             botlist.append(vbot)
         matrix.append(botlist)
     
-    bots = [matrix[i][j] for i in range(len(matrix)) for j in range(len(matrix[0]))]
+    bots = [vbot for botlist in matrix for vbot in botlist]
+    # enough writer threads to keep the whole upload window in flight
+    executor.writers.resize(workers=max(executor.writers.workers, upload_window()))
+
+cache = LRUCache(cache_limit, cache_bytes)
+
+# document message Id -> Telegram file_id, learned at upload or from manifests
+file_ids = {}
+
+def parse_link(string):
+    string, _, file_id = string.partition(":")
+    idd = Id.from_str(string)
+    if(file_id):
+        file_ids[idd] = file_id
+    return idd
+
+def dump_links(ids):
+    """Packed manifest form of document links, carrying the file_ids known for them."""
+    return pack_ids(ids, file_ids)
+
+def split_links(ids, limit):
+    """Document links cut into runs whose packed form fits in `limit` characters."""
+    return [packer.ids for packer in split_ids(ids, limit, file_ids)]
+
+def load_links(text):
+    """Document links of a manifest body, packed or in the old `bot|group|id[:file_id]` form."""
+    text = text.strip()
+    if(text.startswith(PACKED_PREFIX)):
+        ids, found = unpack_ids(text)
+        file_ids.update(found)
+        return ids
+    return [parse_link(token) for token in text.split()]
+
+class TokenBucket:
+    """Token bucket shared by every caller of one token or one token/chat pair."""
+
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self):
+        """Takes a token and returns how many seconds the caller must wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            return max(wait, self.blocked_until - now)
 
-cache = {}
-def gc():
-    while(len(cache) > cache_limit):
-        cache.pop(next(cache.__iter__()))
+    def free_in(self):
+        """Seconds until the next token would be handed out, without taking it."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+            return max(wait, self.blocked_until - now)
+
+    def block(self, seconds):
+        """Honours retry_after: nobody gets a token for the next `seconds`."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+
+buckets = {}
+buckets_lock = threading.Lock()
+
+def bucket(key, rate) -> TokenBucket:
+    with buckets_lock:
+        if(key not in buckets):
+            buckets[key] = TokenBucket(*rate)
+        return buckets[key]
+
+def retry_after(e):
+    if(getattr(e, "error_code", None) != 429):
+        return None
+    try:
+        return e.result_json["parameters"]["retry_after"]
+    except (AttributeError, KeyError, TypeError):
+        return 1
 
 class Bot:
     def __init__(self, bot, group, token):
-        self.bot, self.group = bot, group
+        self.bot, self.group, self.token = bot, group, token
         self.bot_index, self.group_index = tokens.index(token), groups.index(group)
-        self.time = time.time() - 5
+        self.inflight = 0
+        self.inflight_lock = threading.Lock()
+
+    def load(self):
+        return self.inflight
+
+    def free_in(self):
+        """Seconds until this bot may send to its group again."""
+        return max(bucket(self.token, bot_rate).free_in(), bucket((self.token, self.group), chat_rate).free_in())
+
+    def call(self, chat, method, *args, **kwargs):
+        """Runs one API request through the token and chat buckets, retrying on 429."""
+        with self.inflight_lock:
+            self.inflight += 1
+        try:
+            return self._call(chat, method, *args, **kwargs)
+        finally:
+            with self.inflight_lock:
+                self.inflight -= 1
+
+    def _call(self, chat, method, *args, **kwargs):
+        stats = api_stats.get(self.bot_index, method)
+        sent = sum(map(payload_size, args))
+        for attempt in range(retries + 1):
+            limits = [bucket(self.token, bot_rate)]
+            if(chat is not None):
+                limits.append(bucket((self.token, chat), chat_rate))
+            wait = max([b.reserve() for b in limits])
+            if(wait > 0):
+                stats.record_wait(wait)
+                time.sleep(wait)
+            start = time.perf_counter()
+            try:
+                result = getattr(self.bot, method)(*args, **kwargs)
+            except Exception as e:
+                stats.record(time.perf_counter() - start, sent, error=e)
+                if(not isinstance(e, ApiTelegramException)):
+                    raise e
+                delay = retry_after(e)
+                if(delay is None or attempt == retries):
+                    raise e
+                limits[-1].block(delay)
+            else:
+                received = payload_size(result) if method in ("forward_message", "download_file") else 0
+                stats.record(time.perf_counter() - start, sent, received)
+                return result
     
     def send_message(self, text):
-        while(time.time() - self.time < 2):
-            time.sleep(time.time() - self.time)
-        self.time = time.time()
-        id = self.bot.send_message(self.group, text, timeout=1000, parse_mode=None).id
+        id = self.call(self.group, "send_message", self.group, text, timeout=1000, parse_mode=None).id
         cache[Id(self.bot_index, self.group_index, id)] = text
-        gc()
         return id
     
     def send_document(self, contain):
-        while(time.time() - self.time < 2):
-            time.sleep(time.time() - self.time)
-        self.time = time.time()
-        return self.bot.send_document(self.group, contain, timeout=1000).id
+        msg = self.call(self.group, "send_document", self.group, contain, timeout=1000)
+        file_ids[Id(self.bot_index, self.group_index, msg.id)] = msg.document.file_id
+        return msg.id
 
     def send_message_id(self, text):
         id = self.send_message(text)
         return Id(self.bot_index, self.group_index, id)
     
     def send_document_id(self, contain):
-        while(time.time() - self.time < 3):
-            time.sleep(0.2)
-        self.time = time.time()
-        return Id(self.bot_index, self.group_index, self.bot.send_document(self.group, contain, timeout=1000).id)
+        return Id(self.bot_index, self.group_index, self.send_document(contain))
 
     def edit_message(self, idd, text):
+        idd = Id(idd)
         cache[idd] = text
-        gc()
+        if(disk is not None):
+            disk.pop("t" + idd.to_str())
+        if(edit_window > 0):
+            with pending_lock:
+                first = idd not in pending_edits
+                pending_edits[idd] = (self, text)
+            if(first):
+                executor.call_later(edit_window, flush, idd)
+            return
+        return self._edit(idd, text)
+
+    def _edit(self, idd, text):
         try:
-            return self.bot.edit_message_text(text, chat_id=self.group, message_id=idd.id, parse_mode=None, timeout=1000)
-        except telebot.apihelper.ApiTelegramException as e:
+            return self.call(self.group, "edit_message_text", text, chat_id=self.group, message_id=idd.id, parse_mode=None, timeout=1000)
+        except ApiTelegramException as e:
             if "message is not modified" in str(e):
                 pass
             else:
                 raise e
 
     def forward(self, idd):
-        return self.bot.forward_message(trashgroup, groups[idd.group], idd.id)
+        return self.call(trashgroup, "forward_message", trashgroup, groups[idd.group], idd.id)
+
+    def get_file(self, file_id):
+        return self.call(None, "get_file", file_id)
+
+    def download_file(self, file_path):
+        return self.call(None, "download_file", file_path)
 
     def get_text(self, idd):
-        if(idd in cache):
-            return cache[idd]
-        cache[idd] = (text := self.forward(idd).text)
-        gc()
+        idd = Id(idd)
+        pending = pending_edits.get(idd)
+        if(pending is not None):
+            return pending[1]
+        text = cache.get(idd, MISSING)
+        if(text is not MISSING):
+            return text
+        if(disk is not None):
+            text = disk.get("t" + idd.to_str(), MISSING)
+        if(text is MISSING):
+            text = self.forward(idd).text
+            if(disk is not None and text is not None):
+                disk["t" + idd.to_str()] = text
+        cache[idd] = text
         return text
+
+    def get_document(self, idd):
+        """Downloads the document stored in message `idd`, going through the disk cache if enabled."""
+        idd = Id(idd)
+        if(disk is not None):
+            data = disk.get("d" + idd.to_str())
+            if(data is not None):
+                return data
+        data = None
+        if(idd in file_ids):
+            try:
+                data = self.download_file(self.get_file(file_ids[idd]).file_path)
+            except ApiTelegramException:
+                file_ids.pop(idd, None)
+        if(data is None):
+            file_id = file_ids[idd] = self.forward(idd).document.file_id
+            data = self.download_file(self.get_file(file_id).file_path)
+        if(disk is not None):
+            disk["d" + idd.to_str()] = data
+        return data
+
+    def get_document_size(self, idd):
+        """Size in bytes of the document stored in message `idd`, asked for without downloading it."""
+        idd = Id(idd)
+        if(disk is not None):
+            data = disk.get("d" + idd.to_str())
+            if(data is not None):
+                return len(data)
+        if(idd in file_ids):
+            try:
+                return self.get_file(file_ids[idd]).file_size
+            except ApiTelegramException:
+                file_ids.pop(idd, None)
+        file_id = file_ids[idd] = self.forward(idd).document.file_id
+        return self.get_file(file_id).file_size
     
     __str__ = lambda self: f"{self.bot}, {self.group}"
 
+pointer_lock = threading.Lock()
+
+api_stats = Registry()
+
+def stats():
+    """Snapshot of per-bot API metrics and cache counters."""
+    out = {"bots": api_stats.snapshot(), "cache": cache.stats(), "disk_cache": disk.stats() if disk is not None else None}
+    for tier in (out["cache"], out["disk_cache"]):
+        if(tier is not None):
+            lookups = tier["hits"] + tier["misses"]
+            tier["hit_rate"] = tier["hits"] / lookups if lookups else 0
+    return out
+
+def reset_stats():
+    api_stats.reset()
+    cache.reset_stats()
+    if(disk is not None):
+        disk.reset_stats()
+
+# Id -> (bot, text) of edits held back by edit_window
+pending_edits = {}
+pending_lock = threading.Lock()
+
+# Id -> [lock, users] of the flushes running for a message
+flush_locks = {}
+
+def flush(idd):
+    """Sends the pending edit of one message now, if there is one.
+
+    Flushes of one message run one at a time, so a send held up by rate limits
+    cannot land after a newer text and overwrite it."""
+    with pending_lock:
+        entry = flush_locks.setdefault(idd, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            with pending_lock:
+                pending = pending_edits.pop(idd, None)
+            if(pending is not None):
+                pending[0]._edit(idd, pending[1])
+    finally:
+        with pending_lock:
+            entry[1] -= 1
+            if(not entry[1]):
+                del flush_locks[idd]
+
+# objects that hold writes back locally (Int counters); each has a flush() method
+deferred = set()
+
+def defer(obj):
+    """Remembers that `obj` has unwritten changes, so flush_all() makes it write them."""
+    with pending_lock:
+        deferred.add(obj)
+
+def undefer(obj):
+    """Forgets `obj` once it has written its changes back itself."""
+    with pending_lock:
+        deferred.discard(obj)
+
+def flush_all():
+    """Waits for running uploads, then sends every pending edit (repeating if uploads queued more)."""
+    while True:
+        with pending_lock:
+            owners = list(deferred)
+            deferred.clear()
+        for future in [executor.submit_write(obj.flush) for obj in owners]:
+            future.result()
+        executor.wait_all()
+        with pending_lock:
+            ids = list(pending_edits)
+        if(not ids and not deferred):
+            return
+        for future in [executor.submit_write(flush, idd) for idd in ids]:
+            future.result()
+
+# runs before executor's own exit hook, which was registered on import
+atexit.register(flush_all)
+
 def getbot() -> Bot:
+    """Picks the bot/group pair that frees up first, preferring the fewest calls in flight.
+
+    Ties are broken round-robin starting after the previously chosen bot."""
     global pointer
-    pointer = (pointer + 1) % len(bots)
-    return bots[pointer]
+    with pointer_lock:
+        count = len(bots)
+        order = [(pointer + 1 + i) % count for i in range(count)]
+        pointer = min(order, key=lambda i: (round(bots[i].free_in(), 2), bots[i].load()))
+        return bots[pointer]
+
+def upload_window(inflight=None):
+    """Chunks a writer keeps uploading at once: `inflight` when given, else the
+    "write_ahead" setting, else one per bot/group pair (at least WRITE_AHEAD), so
+    adding tokens adds upload throughput."""
+    from .stream import WRITE_AHEAD
+    if(inflight is None):
+        inflight = write_ahead if write_ahead is not None else max(WRITE_AHEAD, len(bots))
+    return max(1, inflight)
 
 def getbot_id(id) -> Bot:
     id = Id(id)
     return matrix[id.bot][id.group]
+
+def reader_for(id) -> Bot:
+    """Least-loaded bot that can forward messages out of id's group (any token works for reads).
+
+    Ties are broken round-robin, so reads picked before any of them starts are spread too."""
+    global reader_pointer
+    id = Id(id)
+    with pointer_lock:
+        reader_pointer = (reader_pointer + 1) % len(matrix)
+        rows = matrix[reader_pointer:] + matrix[:reader_pointer]
+    return min((row[id.group] for row in rows), key=Bot.load)
+
+def get_texts(ids):
+    """Texts of many messages, in order. Cache misses are forwarded concurrently,
+    spread over every token that can read the message's group, and land in the cache.
+
+    Telegram's forwardMessages only answers with new message ids, not texts, so
+    reads cannot be merged into one request; they are fanned out instead."""
+    ids = [Id(idd) for idd in ids]
+    futures = {}
+    for idd in ids:
+        if(idd not in futures and idd not in cache):
+            futures[idd] = executor.submit_read(reader_for(idd).get_text, idd)
+    return [executor.result_of(futures[idd]) if idd in futures else getbot_id(idd).get_text(idd) for idd in ids]
@@ -0,0 +1,222 @@
+import threading
+import traceback
+import atexit
+import heapq
+import time
+import sys
+from concurrent.futures import Future
+from collections import deque
+
+local = threading.local()
+
+class Pool:
+    """Bounded set of worker threads shared by every object of the package.
+
+    Submitting from outside the pool blocks while `queue_size` tasks are already
+    waiting (backpressure). Submitting from inside any pool worker never waits in
+    the queue: if no worker is free to pick the task up it runs inline. A task
+    that was queued anyway and is waited for with result_of() runs inline in the
+    waiter, so tasks that wait for their own subtasks cannot starve the pool.
+    Waits on anything else (a PendingId, a Ready) get no such help.
+
+    A failing task's exception goes to its future; with `report_errors` it is
+    also printed, which is the only trace of errors in fire-and-forget tasks."""
+
+    def __init__(self, name, workers, queue_size, report_errors=False):
+        self.name = name
+        self.workers, self.queue_size = workers, queue_size
+        self.report_errors = report_errors
+        self.tasks = []
+        self.threads = 0
+        self.idle = 0
+        self.pending = 0
+        self.cond = threading.Condition()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self.cond:
+            if getattr(local, "worker", False):
+                if self.idle <= len(self.tasks) and self.threads >= self.workers:
+                    future = None
+            else:
+                while len(self.tasks) >= self.queue_size:
+                    self.cond.wait()
+            if future is not None:
+                self.tasks.append((future, fn, args, kwargs))
+                self.pending += 1
+                if self.idle <= len(self.tasks) - 1 and self.threads < self.workers:
+                    self.threads += 1
+                    threading.Thread(target=self._worker, name=f"tgcloud-{self.name}-{self.threads}", daemon=True).start()
+                self.cond.notify_all()
+                return future
+        future = Future()
+        self._run(future, fn, args, kwargs)
+        return future
+
+    def _run(self, future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+            if self.report_errors:
+                print(f"Exception in {self.name} worker:", file=sys.stderr)
+                traceback.print_exception(e)
+
+    def steal(self, future):
+        """Runs the task of `future` in the calling thread if it is still queued; True if it was."""
+        with self.cond:
+            for i, task in enumerate(self.tasks):
+                if task[0] is future:
+                    del self.tasks[i]
+                    self.cond.notify_all()
+                    break
+            else:
+                return False
+        self._run(*task)
+        with self.cond:
+            self.pending -= 1
+            self.cond.notify_all()
+        return True
+
+    def _worker(self):
+        local.worker = True
+        while True:
+            with self.cond:
+                self.idle += 1
+                while not self.tasks and self.threads <= self.workers:
+                    self.cond.wait()
+                self.idle -= 1
+                if not self.tasks:
+                    self.threads -= 1
+                    return
+                task = self.tasks.pop(0)
+                self.cond.notify_all()
+            self._run(*task)
+            # drop the arguments now: they may be views that keep an mmap open
+            task = None
+            with self.cond:
+                self.pending -= 1
+                self.cond.notify_all()
+
+    def resize(self, workers=None, queue_size=None):
+        with self.cond:
+            if workers is not None:
+                self.workers = workers
+            if queue_size is not None:
+                self.queue_size = queue_size
+            self.cond.notify_all()
+
+    def wait(self):
+        """Blocks until every queued and running task has finished."""
+        with self.cond:
+            while self.pending:
+                self.cond.wait()
+
+class Ready:
+    """Resettable readiness flag of a stored object.
+
+    Loaders and uploaders call set() once the value (or id) is in place, or
+    fail(error) if they could not; wait() blocks until then and re-raises the
+    error, or raises TimeoutError after `timeout` seconds."""
+
+    def __init__(self, ready=False):
+        self.event = threading.Event()
+        self.error = None
+        if ready:
+            self.event.set()
+
+    def set(self):
+        self.error = None
+        self.event.set()
+
+    def fail(self, error):
+        self.error = error
+        self.event.set()
+
+    def clear(self):
+        self.error = None
+        self.event.clear()
+
+    def is_set(self):
+        return self.event.is_set() and self.error is None
+
+    def wait(self, timeout=None):
+        if not self.event.wait(timeout):
+            raise TimeoutError(f"not ready after {timeout} seconds")
+        if self.error is not None:
+            raise self.error
+        return True
+
+class Scheduler:
+    """One timer thread that hands due callbacks to the write pool."""
+
+    def __init__(self):
+        self.heap = []
+        self.counter = 0
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def call_later(self, delay, fn, *args):
+        with self.cond:
+            self.counter += 1
+            heapq.heappush(self.heap, (time.monotonic() + delay, self.counter, fn, args))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name="tgcloud-timer", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.cond.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                _, _, fn, args = heapq.heappop(self.heap)
+            writers.submit(fn, *args)
+
+readers = Pool("read", 16, 1000)
+writers = Pool("write", 8, 1000)
+
+def submit_read(fn, *args, **kwargs) -> Future:
+    return readers.submit(fn, *args, **kwargs)
+
+def submit_write(fn, *args, **kwargs) -> Future:
+    return writers.submit(fn, *args, **kwargs)
+
+def result_of(future):
+    """future.result() for a future of either pool; a task still waiting in the
+    queue runs in the calling thread instead of waiting for a free worker."""
+    readers.steal(future) or writers.steal(future)
+    return future.result()
+
+def map_write(fn, items, inflight):
+    """Results of fn(item) for every item, run on the write pool with at most
+    `inflight` calls pending at once, yielded in the order of `items`.
+
+    Items are pulled lazily, so a generator reading a file is never more than
+    `inflight` items ahead of the uploads."""
+    pending = deque()
+    try:
+        for item in items:
+            if len(pending) >= inflight:
+                yield result_of(pending.popleft())
+            pending.append(submit_write(fn, item))
+        while pending:
+            yield result_of(pending.popleft())
+    finally:
+        for future in pending:
+            future.cancel()
+
+scheduler = Scheduler()
+
+def call_later(delay, fn, *args):
+    scheduler.call_later(delay, fn, *args)
+
+def wait_all():
+    writers.wait()
+    readers.wait()
+    writers.wait()
+
+# workers are daemons, so let pending uploads finish before the interpreter exits
+atexit.register(wait_all)
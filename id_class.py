@@ -1,120 +1,306 @@
 from .bytes_string import *
+from .executor import submit_write
 import threading
+import base64
 
 class Id:
-    def __init__(self, bot=None, group=None, id=None, *, func=None):
-        self.set(bot, group, id, func=func)
-        self.event = threading.Event()
-        self.event.set()
-    
-    def lock(self):
-        self.event.clear()
-        return self
-    
-    def unlock(self):
-        self.event.set()
-        return self
-    
-    def wait_for_unlock(self):
-        self.event.wait()
+    """Address of a stored message: an immutable (bot, group, id) value.
+
+    Id(other_id) returns `other_id` itself, Id(pending) waits for a PendingId
+    and returns what it resolved to, Id("b|g|m") and Id((b, g, m)) parse."""
+
+    __slots__ = ("bot", "group", "id", "_hash", "_str")
+
+    def __new__(cls, bot=None, group=None, id=None):
+        if(type(bot) is Id):
+            return bot
+        if(type(bot) is PendingId):
+            return bot.resolve()
+        if(type(bot) is tuple):
+            bot, group, id = bot
+        elif(type(bot) is str and bot.count("|") == 2):
+            return cls.from_str(bot)
+        return cls._make(bot, group, id)
+
+    @classmethod
+    def _make(cls, bot, group, id):
+        self = object.__new__(cls)
+        setattr_ = object.__setattr__
+        setattr_(self, "bot", bot)
+        setattr_(self, "group", group)
+        setattr_(self, "id", id)
+        setattr_(self, "_hash", hash((bot, group, id)))
+        setattr_(self, "_str", None)
         return self
-    
-    def set(self, bot=None, group=None, id=None, *, func=None):
-        if(func != None):
-            if(hasattr(self, 'func')):
-                def f(self=self):
-                    self.func.join()
-                    func(self)
-                self.func = threading.Thread(target=f)
-                self.func.start()
-            else:
-                self._bot, self._group, self._id = [None] * 3
-                self.func = threading.Thread(target=func, args=(self, ))
-                self.func.start()
-            return self
-        if(type(bot) == Id):
-            self._bot = bot.bot
-            self._group = bot.group
-            self._id = bot.id
-            if(hasattr(bot, 'func')):
-                if(hasattr(self, 'func')):
-                    def f(self=self, bot=bot):
-                        self.func.join()
-                        self.set(*bot)
-                    self.func = threading.Thread(target=f)
-                    self.func.start()
-                else:
-                    self.func = threading.Thread(target=lambda self, bot=bot: self.set(*bot), args=(self, ))
-                    self.func.start()
-            return self
-        if(type(bot) == tuple):
-            self._bot, self._group, self._id = bot
-            return self
-        if(type(bot) == str and bot.count("|") == 2):
-            self.from_str(bot)
-            return
-        self._bot = bot
-        self._group = group
-        self._id = id
 
+    @classmethod
+    def from_str(cls, string):
+        bot, group, id = string.split("|")
+        return cls._make(int(bot), int(group), int(id))
+
+    def to_str(self):
+        if(self._str is None):
+            object.__setattr__(self, "_str", f"{self.bot}|{self.group}|{self.id}")
+        return self._str
+
+    def resolve(self, timeout=None):
         return self
-    
-    @property
-    def bot(self):
-        self.wait_for_unlock()
-        if(hasattr(self, "func")):
-            try:
-                self.func.join()
-                del self.func
-            except AttributeError:
-                pass
-        return self._bot
 
-    @property
-    def group(self):
-        self.wait_for_unlock()
-        if(hasattr(self, "func")):
-            try:
-                self.func.join()
-                del self.func
-            except AttributeError:
-                pass
-        return self._group
-    
-    @property
-    def id(self):
-        self.wait_for_unlock()
-        if(hasattr(self, "func")):
-            try:
-                self.func.join()
-                del self.func
-            except AttributeError:
-                pass
-        return self._id
-    
+    def done(self):
+        return True
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Id is immutable")
+
+    def __reduce__(self):
+        return (Id, (self.bot, self.group, self.id))
+
     def __repr__(self):
         return f"Id({self.bot}, {self.group}, {self.id})"
 
     def __str__(self):
         return self.to_str()
-    
-    def to_str(self):
-        return f"{self.bot}|{self.group}|{self.id}"
-    
-    def from_str(self, string):
-        self.set(*tuple(map(int, string.split('|'))))
-        return self
-    
+
     def __iter__(self):
         yield self.bot
         yield self.group
         yield self.id
-    
+
     def __eq__(self, other):
+        if(type(other) is Id):
+            return self._hash == other._hash and self.bot == other.bot and self.group == other.group and self.id == other.id
         try:
             return tuple(self) == tuple(other)
-        except:
+        except Exception:
             return False
-    
+
     def __hash__(self):
-        return hash(str(self))
\ No newline at end of file
+        return self._hash
+
+
+class PendingId:
+    """Id of a message that is still being sent; resolves once, to an Id.
+
+    PendingId(func=f) runs f(pending) on the write pool; f is expected to call
+    pending.set(...). Reading bot/group/id waits for the resolution and re-raises
+    the error if sending failed."""
+
+    def __init__(self, func=None):
+        self._value = None
+        self._error = None
+        self._event = threading.Event()
+        if(func is not None):
+            submit_write(self._run, func)
+
+    def _run(self, func):
+        try:
+            func(self)
+        except BaseException as e:
+            self.fail(e)
+            raise
+
+    def set(self, bot=None, group=None, id=None):
+        self._value = Id(bot, group, id)
+        self._event.set()
+        return self
+
+    def fail(self, error):
+        self._error = error
+        self._event.set()
+        return self
+
+    def done(self):
+        return self._event.is_set()
+
+    def resolve(self, timeout=None) -> Id:
+        if(not self._event.wait(timeout)):
+            raise TimeoutError("message id is not known yet")
+        if(self._error is not None):
+            raise self._error
+        return self._value
+
+    @property
+    def bot(self):
+        return self.resolve().bot
+
+    @property
+    def group(self):
+        return self.resolve().group
+
+    @property
+    def id(self):
+        return self.resolve().id
+
+    def to_str(self):
+        return self.resolve().to_str()
+
+    def __str__(self):
+        return self.to_str()
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __repr__(self):
+        return f"PendingId({self._value!r})" if self.done() else "PendingId(...)"
+
+
+# Packed id lists (manifest format 1): "#1" + base85 of
+#   varint column count, (varint bot, varint group) per column,
+#   then per id: varint (column << 1 | has_file_id), zigzag varint delta to the
+#   previous message id of the same column, and if has_file_id
+#   varint (length << 1 | raw) followed by the file_id bytes.
+# Message ids of one chat grow by small steps, so an id costs 2-4 bytes instead
+# of the 15-20 characters of "bot|group|id". Lists that do not start with
+# PACKED_PREFIX are the old whitespace separated "bot|group|id[:file_id]" form.
+PACKED_PREFIX = "#"
+PACKED_VERSION = "1"
+# room left on a page for the continuation pointer packed in front of its ids
+POINTER_RESERVE = 32
+
+def _varint(n, out):
+    while n >= 0x80:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _read_varint(data, pos):
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7f) << shift
+        if(b < 0x80):
+            return n, pos
+        shift += 7
+
+def _b85_length(n):
+    return 5 * (n // 4) + (n % 4 + 1 if n % 4 else 0)
+
+class IdPacker:
+    """Builds one packed id list and knows its encoded length as ids are added."""
+
+    def __init__(self, file_ids=None):
+        self.file_ids = file_ids
+        self.columns = {}
+        self.last = []
+        self.table = bytearray()
+        self.body = bytearray()
+        self.ids = []
+
+    def add(self, idd, limit=None):
+        """Appends `idd`; with `limit`, refuses it (returns False) if the text would get longer."""
+        idd = Id(idd)
+        marks = len(self.table), len(self.body)
+        column = self.columns.get((idd.bot, idd.group))
+        new = column is None
+        if(new):
+            column = len(self.last)
+            _varint(idd.bot, self.table)
+            _varint(idd.group, self.table)
+            self.last.append(0)
+        file_id = self.file_ids.get(idd) if self.file_ids else None
+        _varint(column << 1 | (file_id is not None), self.body)
+        delta = idd.id - self.last[column]
+        _varint(delta << 1 if delta >= 0 else (-delta << 1) - 1, self.body)
+        if(file_id is not None):
+            raw = _file_id_bytes(file_id)
+            _varint(len(raw[1]) << 1 | raw[0], self.body)
+            self.body += raw[1]
+        if(limit is not None and self.ids and len(self) > limit):
+            del self.table[marks[0]:]
+            del self.body[marks[1]:]
+            if(new):
+                self.last.pop()
+            return False
+        if(new):
+            self.columns[(idd.bot, idd.group)] = column
+        self.last[column] = idd.id
+        self.ids.append(idd)
+        return True
+
+    def _blob(self):
+        head = bytearray()
+        _varint(len(self.last), head)
+        return bytes(head + self.table + self.body)
+
+    def __len__(self):
+        head = bytearray()
+        _varint(len(self.last), head)
+        return len(PACKED_PREFIX) + len(PACKED_VERSION) + _b85_length(len(head) + len(self.table) + len(self.body))
+
+    def text(self):
+        return PACKED_PREFIX + PACKED_VERSION + base64.b85encode(self._blob()).decode("ascii")
+
+def _file_id_bytes(file_id):
+    # Telegram file_ids are unpadded urlsafe base64: store the decoded bytes when that round-trips
+    try:
+        raw = base64.urlsafe_b64decode(file_id + "=" * (-len(file_id) % 4))
+        if(base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii") == file_id):
+            return 1, raw
+    except ValueError:
+        pass
+    return 0, file_id.encode("utf-8")
+
+def pack_ids(ids, file_ids=None):
+    """Packed text of `ids`; `file_ids` maps some of them to their Telegram file_id."""
+    packer = IdPacker(file_ids)
+    for idd in ids:
+        packer.add(idd)
+    return packer.text()
+
+def split_ids(ids, limit, file_ids=None):
+    """Cuts `ids` into consecutive IdPackers whose text is at most `limit` characters."""
+    packers = [IdPacker(file_ids)]
+    for idd in ids:
+        if(not packers[-1].add(idd, limit)):
+            packers.append(IdPacker(file_ids))
+            packers[-1].add(idd)
+    return packers
+
+def unpack_ids(text):
+    """Ids of a packed list and the file_ids it carries, as ([Id], {Id: file_id})."""
+    text = text.strip()
+    if(not text.startswith(PACKED_PREFIX)):
+        raise ValueError("not a packed id list")
+    version = text[len(PACKED_PREFIX):len(PACKED_PREFIX) + 1]
+    if(version != PACKED_VERSION):
+        raise ValueError(f"unknown id list version {version!r}")
+    data = base64.b85decode(text[len(PACKED_PREFIX) + 1:])
+    make = Id._make
+    columns, pos = _read_varint(data, 0)
+    table = []
+    for _ in range(columns):
+        bot, pos = _read_varint(data, pos)
+        group, pos = _read_varint(data, pos)
+        table.append((bot, group))
+    last = [0] * columns
+    ids, file_ids = [], {}
+    end = len(data)
+    while pos < end:
+        head, pos = _read_varint(data, pos)
+        delta, pos = _read_varint(data, pos)
+        column = head >> 1
+        last[column] += delta >> 1 if not delta & 1 else -((delta + 1) >> 1)
+        bot, group = table[column]
+        idd = make(bot, group, last[column])
+        ids.append(idd)
+        if(head & 1):
+            size, pos = _read_varint(data, pos)
+            raw = data[pos:pos + (size >> 1)]
+            pos += size >> 1
+            if(size & 1):
+                file_ids[idd] = base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+            else:
+                file_ids[idd] = raw.decode("utf-8")
+    return ids, file_ids
+
+def parse_ids(text):
+    """Ids of a manifest body in either format; file_id suffixes of the old format are dropped."""
+    text = text.strip()
+    if(text.startswith(PACKED_PREFIX)):
+        return unpack_ids(text)[0]
+    make, out = Id._make, []
+    for token in text.split():
+        bot, group, id = token.partition(":")[0].split("|")
+        out.append(make(int(bot), int(group), int(id)))
+    return out
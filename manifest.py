@@ -0,0 +1,128 @@
+from .id_class import IdPacker, _varint, _read_varint, _b85_length
+from .config import file_ids
+from collections import namedtuple
+import base64
+import zlib
+
+# Chunk table of a manifest page (LinkedBytes "bl"/"c" pages, LinkedString
+# "sl"/"t" pages): "\n@" + base85 of, per link of the page and in the same
+# order, varint (size << 1 | has_chars), varint chars if has_chars, and the
+# crc32 of the stored document (4 bytes, big-endian). On the head page the
+# entries are preceded by one more varint pair with the totals of the whole
+# object. Pages written before the tables existed simply end after the links.
+TABLE_SEPARATOR = "\n@"
+# room kept on every page for the totals of the head page
+TOTALS_RESERVE = 28
+
+ChunkInfo = namedtuple("ChunkInfo", "size chars crc")
+ChunkInfo.__doc__ = """Length in bytes of a stored document, its length in characters
+(None for raw bytes) and its crc32."""
+
+def chunk_info(data, chars=None):
+    return ChunkInfo(len(data), chars, zlib.crc32(data))
+
+def check_chunk(data, info, link=None):
+    """Raises ValueError if `data` does not match the chunk table entry `info`."""
+    if(info is not None and (len(data) != info.size or zlib.crc32(data) != info.crc)):
+        raise ValueError(f"chunk {link} is corrupted: size or checksum does not match the manifest")
+    return data
+
+def _length(size, chars, out):
+    _varint(size << 1 | (chars is not None), out)
+    if(chars is not None):
+        _varint(chars, out)
+
+class ChunkTable:
+    """Builds the chunk table of one page and knows its encoded length."""
+
+    def __init__(self, total=None):
+        self.head = bytearray()
+        if(total is not None):
+            _length(total[0], total[1], self.head)
+        self.entries = []
+        self.size = len(self.head)
+
+    def add(self, info):
+        entry = bytearray()
+        _length(info.size, info.chars, entry)
+        entry += (info.crc & 0xffffffff).to_bytes(4, "big")
+        self.entries.append(bytes(entry))
+        self.size += len(entry)
+
+    def pop(self):
+        self.size -= len(self.entries.pop())
+
+    def __len__(self):
+        return len(TABLE_SEPARATOR) + _b85_length(self.size)
+
+    def text(self):
+        return TABLE_SEPARATOR + base64.b85encode(bytes(self.head) + b"".join(self.entries)).decode("ascii")
+
+def chunk_table(infos, total=None):
+    """Table text of a page holding chunks `infos`; "" when some of them are unknown."""
+    if(any(info is None for info in infos)):
+        return ""
+    table = ChunkTable(total)
+    for info in infos:
+        table.add(info)
+    return table.text()
+
+def totals(infos):
+    """(size, chars) of a whole object, or None when a chunk is unknown."""
+    if(any(info is None for info in infos)):
+        return None
+    chars = [info.chars for info in infos]
+    return sum(info.size for info in infos), None if None in chars else sum(chars)
+
+def split_table(text):
+    """Splits a page body into its links text and its table text (None if it has none)."""
+    body, sep, table = text.partition(TABLE_SEPARATOR)
+    return body, (table if sep else None)
+
+def read_table(table, count, head=False):
+    """Chunk infos of a page with `count` links, plus the totals (size, chars) on the head page.
+
+    A page without a table gives [None] * count and no totals."""
+    if(table is None):
+        return None, [None] * count
+    data = base64.b85decode(table)
+    pos = 0
+    total = None
+
+    def length():
+        nonlocal pos
+        n, pos = _read_varint(data, pos)
+        chars = None
+        if(n & 1):
+            chars, pos = _read_varint(data, pos)
+        return n >> 1, chars
+
+    if(head):
+        total = length()
+    infos = []
+    for _ in range(count):
+        size, chars = length()
+        infos.append(ChunkInfo(size, chars, int.from_bytes(data[pos:pos + 4], "big")))
+        pos += 4
+    return total, infos
+
+def split_chunks(ids, infos, limit):
+    """Document links cut into runs whose packed form and chunk table fit in `limit`
+    characters, as [(ids, infos)]. Without complete infos only the links are counted."""
+    if(any(info is None for info in infos)):
+        infos = [None] * len(ids)
+    runs = []
+    packer, table = IdPacker(file_ids), ChunkTable()
+    start = 0
+    for i, (idd, info) in enumerate(zip(ids, infos)):
+        if(info is not None):
+            table.add(info)
+        room = limit - TOTALS_RESERVE - (len(table) if info is not None else 0)
+        if(not packer.add(idd, room)):
+            runs.append((packer.ids, infos[start:i]))
+            packer, table, start = IdPacker(file_ids), ChunkTable(), i
+            if(info is not None):
+                table.add(info)
+            packer.add(idd)
+    runs.append((packer.ids, infos[start:]))
+    return runs
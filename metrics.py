@@ -0,0 +1,80 @@
+import threading
+import bisect
+
+# upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def payload_size(value):
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, memoryview):
+        return value.nbytes
+    text = getattr(value, "text", None)
+    return len(text) if isinstance(text, str) else 0
+
+class MethodStats:
+    """Counters and a latency histogram for one API method of one bot."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = self.errors = self.rate_limited = 0
+        self.bytes_sent = self.bytes_received = 0
+        self.latency_sum = self.waited = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, latency, sent=0, received=0, error=None):
+        with self.lock:
+            self.calls += 1
+            self.bytes_sent += sent
+            self.bytes_received += received
+            self.latency_sum += latency
+            self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            if error is not None:
+                self.errors += 1
+                if getattr(error, "error_code", None) == 429:
+                    self.rate_limited += 1
+
+    def record_wait(self, seconds):
+        with self.lock:
+            self.waited += seconds
+
+    def snapshot(self):
+        with self.lock:
+            buckets = {str(b): n for b, n in zip(LATENCY_BUCKETS, self.latency_buckets)}
+            buckets["inf"] = self.latency_buckets[-1]
+            return {"calls": self.calls, "errors": self.errors, "rate_limited": self.rate_limited,
+                    "bytes_sent": self.bytes_sent, "bytes_received": self.bytes_received,
+                    "latency_sum": self.latency_sum, "latency_avg": self.latency_sum / self.calls if self.calls else 0,
+                    "latency_buckets": buckets, "rate_limit_wait": self.waited}
+
+class Registry:
+    """MethodStats per (bot index, method), created on first use."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def get(self, bot, method) -> MethodStats:
+        stats = self.stats.get((bot, method))
+        if stats is None:
+            with self.lock:
+                stats = self.stats.setdefault((bot, method), MethodStats())
+        return stats
+
+    def snapshot(self):
+        with self.lock:
+            items = list(self.stats.items())
+        out = {}
+        for (bot, method), stats in items:
+            out.setdefault(bot, {})[method] = stats.snapshot()
+        return out
+
+    def reset(self):
+        with self.lock:
+            items = list(self.stats.values())
+        for stats in items:
+            with stats.lock:
+                stats.reset()
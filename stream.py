@@ -0,0 +1,127 @@
+from .executor import submit_read, result_of
+from itertools import accumulate
+from contextlib import contextmanager
+import bisect
+import mmap
+import io
+import os
+
+READ_AHEAD = 4                  # chunks fetched in parallel ahead of the reader
+MEMORY_BUDGET = 100 * 2 ** 20   # bytes of chunks a reader may hold at once
+WRITE_AHEAD = 4                 # fewest chunks a writer keeps uploading at once, see config.upload_window
+COPY_BUFFER = 2 ** 20
+
+
+class ChunkReader(io.RawIOBase):
+    """Seekable raw stream over chunks that are fetched on demand.
+
+    `fetchers[i]()` returns the bytes of chunk i and `sizes[i]` is its length.
+    While a chunk is consumed the next `read_ahead` ones download in parallel;
+    the window shrinks so that it never holds more than `memory` bytes (at least
+    the current chunk is always held). Chunks behind the position are dropped."""
+
+    def __init__(self, fetchers, sizes, read_ahead=READ_AHEAD, memory=MEMORY_BUDGET):
+        super().__init__()
+        self._fetchers = list(fetchers)
+        self._starts = [0, *accumulate(sizes)]
+        largest = max(sizes, default=0) or 1
+        self.read_ahead = max(0, min(read_ahead, memory // largest - 1))
+        self._pos = 0
+        self._window = {}  # chunk index -> Future of its bytes
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        self._checkClosed()
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._checkClosed()
+        if(whence == io.SEEK_SET):
+            pos = offset
+        elif(whence == io.SEEK_CUR):
+            pos = self._pos + offset
+        elif(whence == io.SEEK_END):
+            pos = self._starts[-1] + offset
+        else:
+            raise ValueError(f"invalid whence ({whence!r})")
+        if(pos < 0):
+            raise ValueError(f"negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def _chunk(self, i):
+        for k in list(self._window):
+            if(k < i or k > i + self.read_ahead):
+                self._window.pop(k).cancel()
+        for k in range(i, min(i + self.read_ahead + 1, len(self._fetchers))):
+            if(k not in self._window):
+                self._window[k] = submit_read(self._fetchers[k])
+        return result_of(self._window[i])
+
+    def readinto(self, buffer):
+        self._checkClosed()
+        out = memoryview(buffer).cast("B")
+        starts, done = self._starts, 0
+        while done < len(out) and self._pos < starts[-1]:
+            i = bisect.bisect_right(starts, self._pos) - 1
+            data = memoryview(self._chunk(i))
+            lo = self._pos - starts[i]
+            n = min(len(out) - done, len(data) - lo)
+            if(n <= 0):
+                raise OSError(f"chunk {i} is shorter than its recorded size")
+            out[done:done + n] = data[lo:lo + n]
+            done += n
+            self._pos += n
+        return done
+
+    def close(self):
+        for future in self._window.values():
+            future.cancel()
+        self._window.clear()
+        super().close()
+
+
+@contextmanager
+def mapped(file):
+    """memoryview of a local file from its current position on, over a read-only mmap.
+
+    `file` is a path or an open file object. Yields None when the file cannot be
+    mapped (pipes, sockets, in-memory files, empty files), so the caller falls
+    back to reading it. Views cut from the yielded one must be released by the
+    end of the block; an open file object is left positioned at its end."""
+    close_after = isinstance(file, (str, bytes, os.PathLike))
+    f = open(file, "rb") if close_after else file
+    try:
+        if(isinstance(f, io.TextIOBase)):
+            # positions of text files are opaque cookies, not byte offsets
+            yield None
+            return
+        try:
+            fd = f.fileno()
+            start = f.tell() if not close_after else 0
+            size = os.fstat(fd).st_size
+            m = mmap.mmap(fd, 0, access=mmap.ACCESS_READ) if size > start else None
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            m = None
+        if(m is None):
+            yield None
+            return
+        view = memoryview(m)[start:]
+        try:
+            yield view
+        finally:
+            view.release()
+            try:
+                m.close()
+            except BufferError:
+                pass  # a slice is still referenced somewhere; the map closes when it is collected
+            if(not close_after):
+                f.seek(size)
+    finally:
+        if(close_after):
+            f.close()
@@ -0,0 +1,30 @@
+"""Regression tests, run against backend.FakeTelegram:
+
+    python -m unittest discover -s tgcloud/tests -t .
+
+from the directory holding the package."""
+from .. import executor
+from ..config import config, cache
+from ..backend import FakeTelegram
+
+fake = None
+
+def setup():
+    """Points the package at a fresh fake backend (once per run)."""
+    global fake
+    if fake is None:
+        fake = FakeTelegram()
+        config({
+            "backend": fake,
+            "tokens": ["test0", "test1"],
+            "groups": [-100, -101],
+            "trashgroup": -1,
+            "bot_rate": (1000, 1000),
+            "chat_rate": (1000, 1000),
+        })
+    return fake
+
+def cold():
+    """Forgets every cached message so the next reads hit the backend."""
+    executor.wait_all()
+    cache.clear()
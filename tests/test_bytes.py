@@ -0,0 +1,169 @@
+import importlib
+import io
+import mmap
+import os
+import tempfile
+import unittest
+
+from . import setup, cold
+
+# the package re-exports the Bytes class under the module's name
+B = importlib.import_module("..Bytes", __package__)
+
+class SmallChunks(unittest.TestCase):
+    """Runs with 10-byte chunks so a few bytes span several documents."""
+
+    def setUp(self):
+        setup()
+        self.file_size = B.FILE_SIZE
+        B.FILE_SIZE = 10
+
+    def tearDown(self):
+        B.FILE_SIZE = self.file_size
+
+class LinkedBytesAdd(SmallChunks):
+
+    def test_add_to_existing(self):
+        lb = B.LinkedBytes(value=b"abc" * 5)
+        lb.add(b"X" * 7)
+        self.assertEqual(bytes(lb.wait()), b"abc" * 5 + b"X" * 7)
+        self.assertTrue(all(c.size() <= 10 for c in lb.chuncs))
+        cold()
+        self.assertEqual(bytes(B.LinkedBytes(id=lb.id)), b"abc" * 5 + b"X" * 7)
+
+    def test_add_without_change_last(self):
+        lb = B.LinkedBytes(value=b"abc")
+        lb.add(b"defghijklmnop", change_last=False)
+        self.assertEqual(bytes(lb.wait()), b"abcdefghijklmnop")
+        self.assertEqual([c.size() for c in lb.chuncs], [3, 10, 3])
+
+class LinkedBytesSet(SmallChunks):
+
+    def test_cached_chunks_own_their_data(self):
+        data = os.urandom(1000)
+        lb = B.LinkedBytes(value=data, cache_limit=2).wait()
+        cached = [c.value for c in lb.chuncs if c.event.is_set()]
+        self.assertTrue(cached)
+        self.assertTrue(all(type(v) is bytes for v in cached))
+        self.assertEqual(bytes(lb), data)
+
+    def test_fully_cached_chunks_share_the_value(self):
+        data = os.urandom(1000)
+        lb = B.LinkedBytes(value=data).wait()
+        self.assertTrue(all(c.value.obj is data for c in lb.chuncs))
+        self.assertEqual(bytes(lb), data)
+
+    def test_mapped_value_is_not_kept(self):
+        data = os.urandom(1000)
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                view = memoryview(m)
+                lb = B.LinkedBytes(value=view).wait()
+                view.release()
+        self.assertFalse(any(c.event.is_set() for c in lb.chuncs))
+        self.assertEqual(bytes(lb), data)
+
+class LinkedBytesLoad(SmallChunks):
+
+    def test_range_read_downloads_only_its_chunks(self):
+        fake = setup()
+        data = os.urandom(500)
+        lb = B.LinkedBytes(value=data).wait()
+        cold()
+        fake.reset_stats()
+        loaded = B.LinkedBytes(id=lb.id)
+        self.assertEqual(loaded.read(205, 10), data[205:215])
+        cold()
+        self.assertLessEqual(fake.calls["download_file"], 2)
+        self.assertFalse(any(c.event.is_set() for c in loaded.chuncs))
+        self.assertEqual(bytes(loaded.cache()), data)
+
+class LinkedBytesWithoutTable(SmallChunks):
+    """Blobs whose manifest was written before chunk tables existed."""
+
+    def setUp(self):
+        super().setUp()
+        C = importlib.import_module("..config", __package__)
+        M = importlib.import_module("..manifest", __package__)
+        self.data = os.urandom(200)
+        lb = B.LinkedBytes(value=self.data).wait()
+        body, table = M.split_table(C.getbot_id(lb.id).get_text(lb.id))
+        self.assertIsNotNone(table)
+        C.getbot_id(lb.id).edit_message(lb.id, body)
+        cold()
+        self.fake = setup()
+        self.fake.reset_stats()
+        self.loaded = B.LinkedBytes(id=lb.id)
+
+    def test_range_read(self):
+        self.assertEqual(self.loaded.read(105, 10), self.data[105:115])
+        self.assertEqual(self.fake.calls["download_file"], 2)
+        self.assertFalse(any(c.event.is_set() for c in self.loaded.chuncs))
+
+    def test_stream(self):
+        with self.loaded.open() as reader:
+            self.assertEqual(reader.read(), self.data)
+        self.assertEqual(self.fake.calls["download_file"], 20)
+        self.assertFalse(any(c.event.is_set() for c in self.loaded.chuncs))
+        self.assertEqual(len(self.loaded), 200)
+        self.assertEqual(self.fake.calls["download_file"], 20)
+
+    def test_save(self):
+        target = io.BytesIO()
+        self.loaded.save(target)
+        self.assertEqual(target.getvalue(), self.data)
+        self.assertEqual(self.fake.calls["download_file"], 20)
+        self.assertFalse(any(c.event.is_set() for c in self.loaded.chuncs))
+
+
+class LinkedBytesWriter(SmallChunks):
+
+    def test_write_replaces(self):
+        lb = B.LinkedBytes(value=b"old data").wait()
+        with lb.open("wb") as writer:
+            writer.write(b"new" * 9)
+        self.assertEqual(bytes(lb), b"new" * 9)
+
+    def test_failed_write_leaves_target(self):
+        lb = B.LinkedBytes(value=b"old data").wait()
+        manifest = lb.id
+        with self.assertRaises(RuntimeError):
+            with lb.open("wb") as writer:
+                writer.write(b"partial" * 5)
+                raise RuntimeError("producer failed")
+        self.assertTrue(writer.closed)
+        self.assertEqual(bytes(lb), b"old data")
+        cold()
+        self.assertEqual(bytes(B.LinkedBytes(id=manifest)), b"old data")
+
+class LinkedBytesFromFile(SmallChunks):
+
+    def write(self, data):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_mapped_file(self):
+        data = os.urandom(95)
+        lb = B.LinkedBytes(value=b"xy").from_file(self.write(data))
+        self.assertEqual(bytes(lb.wait()), b"xy" + data)
+        self.assertTrue(all(c.size() <= 10 for c in lb.chuncs))
+
+    def test_append_after_full_chunk(self):
+        lb = B.LinkedBytes(value=b"abc" * 20).from_file(self.write(b"hello"))
+        self.assertEqual(bytes(lb.wait()), b"abc" * 20 + b"hello")
+        cold()
+        self.assertEqual(bytes(B.LinkedBytes(id=lb.id)), b"abc" * 20 + b"hello")
+
+    def test_bytes_from_path(self):
+        data = os.urandom(B.THRESHOLD + 1)
+        b = B.Bytes(path=self.write(data))
+        self.assertIsInstance(b._obj, B.LinkedBytes)
+        self.assertEqual(bytes(b), data)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import importlib
+import threading
+import time
+import unittest
+
+from . import setup, cold
+
+C = importlib.import_module("..config", __package__)
+
+class EditWindow(unittest.TestCase):
+
+    def setUp(self):
+        setup()
+        C.config({"edit_window": 0.05})
+
+    def tearDown(self):
+        C.config({"edit_window": 0})
+
+    def test_slow_flush_does_not_overwrite_newer_text(self):
+        bot = C.getbot()
+        idd = bot.send_message_id("start")
+        edit, sending, release = C.Bot._edit, threading.Event(), threading.Event()
+
+        def slow(self, idd, text):
+            # the first flush is held up, as by a rate limit, until the newer edit is queued
+            if(text == "old"):
+                sending.set()
+                release.wait(5)
+            return edit(self, idd, text)
+
+        C.Bot._edit = slow
+        try:
+            bot.edit_message(idd, "old")
+            self.assertTrue(sending.wait(5))
+            bot.edit_message(idd, "new")
+            threading.Timer(0.2, release.set).start()
+            C.flush_all()
+        finally:
+            C.Bot._edit = edit
+        cold()
+        self.assertEqual(C.getbot_id(idd).get_text(idd), "new")
+        self.assertEqual(C.flush_locks, {})
+
+class Deferred(unittest.TestCase):
+
+    def setUp(self):
+        setup()
+
+    def test_counter_forgotten_after_flush(self):
+        Int = importlib.import_module("..Int", __package__).Int
+        i = Int(0, counter=True, flush_interval=0.05)
+        i += 1
+        self.assertIn(i, C.deferred)
+        deadline = time.monotonic() + 5
+        while i in C.deferred and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertNotIn(i, C.deferred)
+        cold()
+        self.assertEqual(int(Int(id=i.id)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
+
+class UploadWindow(unittest.TestCase):
+
+    def setUp(self):
+        setup()
+
+    def tearDown(self):
+        C.config({"write_ahead": None, "tokens": ["test0", "test1"]})
+
+    def test_grows_with_bots(self):
+        E = importlib.import_module("..executor", __package__)
+        C.config({"tokens": ["test%d" % i for i in range(8)]})
+        self.assertEqual(C.upload_window(), 16)
+        self.assertGreaterEqual(E.writers.workers, 16)
+        self.assertEqual(C.upload_window(3), 3)
+        C.config({"write_ahead": 2})
+        self.assertEqual(C.upload_window(), 2)
@@ -0,0 +1,43 @@
+import base64
+import importlib
+import unittest
+
+from . import setup, cold
+
+C = importlib.import_module("..config", __package__)
+I = importlib.import_module("..Int", __package__)
+
+class IntFormats(unittest.TestCase):
+
+    def setUp(self):
+        setup()
+
+    def load(self, text):
+        idd = C.getbot().send_message_id(text)
+        cold()
+        return int(I.Int(id=idd))
+
+    def test_round_trip_248(self):
+        i = I.Int(248)
+        cold()
+        self.assertEqual(int(I.Int(id=i.id)), 248)
+
+    def test_legacy_base64_starting_with_plus(self):
+        # 248..251 encode as "+A==".."+w==", which once read as a shard list
+        for value in range(248, 252):
+            text = "i" + base64.b64encode(value.to_bytes(1, "little")).decode()
+            self.assertTrue(text.startswith("i+"))
+            self.assertEqual(self.load(text), value)
+
+    def test_shards(self):
+        i = I.Int(5, shards=3)
+        i += 7
+        cold()
+        self.assertEqual(int(I.Int(id=i.id)), 12)
+
+    def test_shards_with_old_tag(self):
+        shards = [C.getbot().send_message_id(I.int_text(v)) for v in (3, 4)]
+        self.assertEqual(self.load("i+" + I.pack_ids(shards)), 7)
+
+if __name__ == "__main__":
+    unittest.main()
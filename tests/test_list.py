@@ -0,0 +1,49 @@
+import importlib
+import unittest
+
+from . import setup, cold
+
+C = importlib.import_module("..config", __package__)
+L = importlib.import_module("..List", __package__)
+
+class ColdOpen(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = setup()
+        self.entries = C.cache.max_entries
+        C.config({"cache_size": 100})
+
+    def tearDown(self):
+        C.config({"cache_size": self.entries})
+
+    def test_page_larger_than_cache_forwards_each_message_once(self):
+        n = 300
+        lst = L.List(list(range(n)))
+        cold()
+        self.fake.reset_stats()
+        loaded = L.List(id=lst.id)
+        self.assertEqual([int(v) for v in loaded], list(range(n)))
+        cold()
+        # every item once, plus the list head and its page
+        self.assertLessEqual(self.fake.calls["forward_message"], n + 2)
+
+class ParallelPages(unittest.TestCase):
+
+    def setUp(self):
+        setup()
+        self.entries = C.cache.max_entries
+        C.config({"cache_size": 10000})
+
+    def tearDown(self):
+        C.config({"cache_size": self.entries})
+
+    def test_short_last_page(self):
+        n = 2000
+        lst = L.List(list(range(n)))
+        cold()
+        loaded = L.List(id=lst.id)
+        self.assertEqual([int(v) for v in loaded], list(range(n)))
+        self.assertGreater(len(loaded.pages), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import importlib
+import os
+import random
+import tempfile
+import unittest
+
+from . import setup, cold
+
+S = importlib.import_module("..String", __package__)
+
+class LinkedStringIndex(unittest.TestCase):
+    """Chunks cut from a file hold FILE_SIZE bytes, not FILE_SIZE characters."""
+
+    def setUp(self):
+        setup()
+        self.file_size = S.FILE_SIZE
+        S.FILE_SIZE = 10
+        self.text = "".join(random.choices("aé€😀", k=60))
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.text)
+
+    def tearDown(self):
+        S.FILE_SIZE = self.file_size
+        os.remove(self.path)
+
+    def test_index_file_chunks(self):
+        ls = S.LinkedString(path=self.path)
+        self.assertEqual(len(ls), len(self.text))
+        self.assertEqual("".join(ls[i] for i in range(len(self.text))), self.text)
+        self.assertEqual(ls[-1], self.text[-1])
+        self.assertEqual(ls[7:41], self.text[7:41])
+        self.assertEqual(ls[3:50:4], self.text[3:50:4])
+        with self.assertRaises(IndexError):
+            ls[len(self.text)]
+
+    def test_index_reloaded(self):
+        ls = S.LinkedString(path=self.path)
+        cold()
+        loaded = S.LinkedString(id=ls.id)
+        self.assertEqual(loaded[33], self.text[33])
+        self.assertEqual(loaded[20:30], self.text[20:30])
+
+    def test_set_char(self):
+        ls = S.LinkedString(path=self.path)
+        ls[25] = "Z"
+        cold()
+        self.assertEqual(str(S.LinkedString(id=ls.id)), self.text[:25] + "Z" + self.text[26:])
+
+class LinkedStringStream(unittest.TestCase):
+
+    def setUp(self):
+        setup()
+        self.file_size = S.FILE_SIZE
+        S.FILE_SIZE = 10
+
+    def tearDown(self):
+        S.FILE_SIZE = self.file_size
+
+    def test_manifest_without_chunk_table(self):
+        C = importlib.import_module("..config", __package__)
+        M = importlib.import_module("..manifest", __package__)
+        text = "".join(random.choices("aé€", k=45))
+        ls = S.LinkedString(text)
+        ls.wait()
+        # rewrite the manifest as it was before chunk tables existed
+        body, table = M.split_table(C.getbot_id(ls.id).get_text(ls.id))
+        self.assertIsNotNone(table)
+        C.getbot_id(ls.id).edit_message(ls.id, body)
+        cold()
+        fake = setup()
+        fake.reset_stats()
+        with S.LinkedString(id=ls.id).open() as reader:
+            self.assertEqual(reader.read(), text)
+        self.assertEqual(fake.calls["download_file"], 5)
+
+if __name__ == "__main__":
+    unittest.main()
+
+class Utf8Length(unittest.TestCase):
+
+    def setUp(self):
+        self.copy_buffer = S.COPY_BUFFER
+        S.COPY_BUFFER = 3  # windows split multibyte characters
+
+    def tearDown(self):
+        S.COPY_BUFFER = self.copy_buffer
+
+    def test_counts_across_windows(self):
+        text = "".join(random.choices("aé€😀", k=200))
+        self.assertEqual(S._utf8_length(memoryview(text.encode())), len(text))
+
+    def test_invalid(self):
+        self.assertIsNone(S._utf8_length("aé€".encode()[:-1]))
+        self.assertIsNone(S._utf8_length(b"ab\xffcd"))